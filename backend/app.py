@@ -1,12 +1,24 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, send_file
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from llm import model
-from config import POSTGRESQL_BASE_URL
+from config import POSTGRESQL_BASE_URL, WARMUP_MODELS, WARMUP_IN_BACKGROUND, ARTIFACT_TTL_SECONDS, ASYNC_GENERATION, JOB_WORKERS, JOB_MAX_PENDING, JOB_HEARTBEAT_SECONDS, JOB_STALE_SECONDS, GENERATION_CACHE_ENABLED, RETRIEVAL_PREFETCH, RETRIEVAL_PREFETCH_WORKERS
 import uuid
-from graph import graph_agentor
-from vector_rag import vector_store
-from langchain_core.documents import Document
+import io
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from graph import graph_agentor, stream_graph, retrieve_context, generate_sow as render_sow
+from sow_input import query_map_from_form, build_user_query
+from vector_rag import get_vector_store
+from ingest import chunk_documents
+import model_registry
+import metrics
+from artifact_store import artifact_store
+from job_queue import JobQueue, QueueFullError, JobCancelled
+from generation_cache import generation_cache
 
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
@@ -30,112 +42,354 @@ class SOWUserInput(db.Model):
     deliverables = db.Column(db.Text,nullable = False)
     project_timeline = db.Column(db.Text,nullable = False)
 
+class SOWJob(db.Model):
+    id = db.Column(db.String(36), primary_key=True)
+    user_input_id = db.Column(db.Integer, db.ForeignKey(SOWUserInput.id), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    progress = db.Column(db.JSON, nullable=False, default=list)          # One entry per graph node run.
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)      # Set by DELETE in any process.
+    heartbeat_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Refreshed by the process holding the job.
+
+    def to_dict(self):
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "createdAt": self.created_at.isoformat() if self.created_at else None,
+            "startedAt": self.started_at.isoformat() if self.started_at else None,
+            "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+def save_user_input(query_map):
+    # Store user's query in database for future use.
+    user_input = SOWUserInput(**query_map)
+    db.session.add(user_input)
+    db.session.commit()
+    return user_input.id
+
+def sow_response(state):
+    return {
+        "status": "success",
+        "message": state['formatted_sow'],
+        "sow_json": state['sow'],
+        "fileName": state['doc_file_path']
+    }
+
+retrieval_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_PREFETCH_WORKERS, thread_name_prefix="sow-retrieval")
+
+def form_inputs(data, prefetch_context=False, check_cache=False):
+    """
+    Save the submitted form and return the graph inputs, the saved row id, the
+    cached response (with check_cache, on a generation-cache hit) and, with
+    prefetch_context on a miss, a future for the retrieved context. Retrieval
+    does not depend on the saved row, so it runs while the row is inserted.
+    """
+    query_map = query_map_from_form(data)
+    inputs = {
+        'user_query': build_user_query(query_map),
+        'query_map': query_map,
+        'request_id': str(uuid.uuid4()),
+    }
+    cached = cached_sow_response(inputs) if check_cache else None
+    context_future = None
+    if cached is None and prefetch_context and RETRIEVAL_PREFETCH:
+        context_future = retrieval_pool.submit(retrieve_context, inputs['user_query'])
+    user_input_id = save_user_input(query_map)
+    return inputs, user_input_id, cached, context_future
+
+def with_prefetched_context(inputs, context_future):
+    """Add prefetched context to the inputs; the graph retrieves it itself if prefetching failed."""
+    if context_future is None:
+        return inputs
+    try:
+        return {**inputs, 'additional_context': context_future.result()}
+    except Exception as e:
+        print(f"❌ Context prefetch failed: {e}")
+        return inputs
+
+def chat_inputs(data):
+    user_query = data.get("message", "Unknown")
+    generated_sow = data.get("context", "Unknown")
+    return {
+        'user_query': user_query,
+        'flow': 'chat',
+        'previous_sow': generated_sow,
+        'request_id': str(uuid.uuid4()),
+    }
+
+def use_cache(data):
+    """The cache can be skipped per request with ?cache=false or "bypassCache": true."""
+    if not GENERATION_CACHE_ENABLED or request.args.get("cache", "true").lower() == "false":
+        return False
+    return not data.get("bypassCache", False)
+
+def cached_sow_response(inputs):
+    entry = generation_cache.get(inputs['query_map'])
+    if entry is None:
+        return None
+    file_name = entry["fileName"]
+    if artifact_store.get(file_name) is None:
+        # The document expired before the cache entry: re-render it, no LLM call needed.
+        file_name = render_sow(entry["sow_data"], inputs['request_id'])["fileName"]
+    return {
+        "status": "success",
+        "message": entry["message"],
+        "sow_json": entry["sow_json"],
+        "fileName": file_name,
+        "cached": True,
+    }
+
+def cache_generation(inputs, state):
+    # Only complete, accepted generations from the form flow are cached.
+    if not GENERATION_CACHE_ENABLED or 'query_map' not in inputs:
+        return
+    if state.get('error') or not state.get('validated_sow'):
+        return
+    generation_cache.set(inputs['query_map'], {**sow_response(state), "sow_data": state['validated_sow']})
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def stream_sow(inputs, cached=None, context_future=None):
+    """Run the graph and relay its progress as server-sent events."""
+    def events():
+        if cached is not None:
+            yield sse_event("final", cached)
+            return
+        try:
+            graph_inputs = inputs
+            if context_future is not None:
+                # Let the client show progress before waiting on the prefetched retrieval.
+                yield sse_event("node_start", {"node": "get_relevant_context"})
+                graph_inputs = with_prefetched_context(inputs, context_future)
+            for event, data in stream_graph(graph_inputs):
+                if event == "final":
+                    cache_generation(inputs, data)
+                    data = sow_response(data)
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", {"status": "error", "message": str(e)})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        # Stop proxies from buffering the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def update_job(job_id, **fields):
+    job = db.session.get(SOWJob, job_id)
+    for name, value in fields.items():
+        setattr(job, name, value)
+    db.session.commit()
+    return job
+
+def cancel_requested(job_id, cancel_event):
+    """Cancelled in this process, or through the job row by any other."""
+    if cancel_event.is_set():
+        return True
+    return bool(db.session.query(SOWJob.cancel_requested).filter_by(id=job_id).scalar())
+
+def run_sow_job(job_id, inputs, cancel_event):
+    """Run one queued generation on a worker thread, recording progress per node."""
+    with app.app_context():
+        if cancel_requested(job_id, cancel_event):
+            update_job(job_id, status="cancelled", finished_at=datetime.utcnow())
+            return
+        update_job(job_id, status="running", started_at=datetime.utcnow())
+        progress = []
+        try:
+            final_state = None
+            for event, data in stream_graph(inputs):
+                # Cancellation is checked between graph events.
+                if cancel_requested(job_id, cancel_event):
+                    raise JobCancelled()
+                if event == "node_start":
+                    progress.append({"node": data["node"], "status": "running"})
+                    update_job(job_id, progress=list(progress))
+                elif event == "node_finish":
+                    # Checks run in parallel, so match the finish to its own start.
+                    index = max(i for i, step in enumerate(progress)
+                                if step["node"] == data["node"] and step["status"] == "running")
+                    progress[index] = {"node": data["node"], "status": "done", "seconds": data["seconds"]}
+                    update_job(job_id, progress=list(progress))
+                elif event == "final":
+                    final_state = data
+            cache_generation(inputs, final_state)
+            update_job(job_id, status="succeeded", result=sow_response(final_state),
+                       finished_at=datetime.utcnow())
+        except JobCancelled:
+            update_job(job_id, status="cancelled", finished_at=datetime.utcnow())
+        except Exception as e:
+            db.session.rollback()
+            update_job(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+
+job_queue = JobQueue(run_sow_job, max_workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING)
+_heartbeat_pid = None
+_heartbeat_lock = threading.Lock()
+
+def sweep_stale_jobs():
+    """Fail queued or running jobs whose process stopped refreshing their heartbeat."""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    swept = SOWJob.query.filter(SOWJob.status.in_(["queued", "running"]), SOWJob.heartbeat_at < cutoff).update(
+        {"status": "failed", "error": "Interrupted: the process running this job stopped.",
+         "finished_at": datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    return swept
+
+def job_heartbeat():
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            with app.app_context():
+                job_ids = job_queue.job_ids()
+                if job_ids:
+                    SOWJob.query.filter(SOWJob.id.in_(job_ids)).update(
+                        {"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+                    db.session.commit()
+                sweep_stale_jobs()
+        except Exception as e:
+            print(f"❌ Job heartbeat failed: {e}")
+
+def start_job_heartbeat():
+    # Once per process: threads started in the gunicorn master do not survive the fork.
+    global _heartbeat_pid
+    with _heartbeat_lock:
+        if _heartbeat_pid != os.getpid():
+            _heartbeat_pid = os.getpid()
+            threading.Thread(target=job_heartbeat, name="sow-job-heartbeat", daemon=True).start()
+
+def load_job(job_id):
+    job = db.session.get(SOWJob, job_id)
+    if job is not None and job.status in ("queued", "running") and \
+            job.heartbeat_at < datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS):
+        sweep_stale_jobs()
+        db.session.refresh(job)
+    return job
+
+def wants_async(data):
+    flag = request.args.get("async", data.get("async", ASYNC_GENERATION))
+    return str(flag).lower() == "true"
+
+def enqueue_sow_job(inputs, user_input_id=None):
+    job = SOWJob(id=inputs['request_id'], user_input_id=user_input_id, progress=[])
+    db.session.add(job)
+    db.session.commit()
+    try:
+        job_queue.submit(job.id, inputs)
+    except QueueFullError:
+        db.session.delete(job)
+        db.session.commit()
+        raise
+    start_job_heartbeat()
+    return job
+
 @app.route('/generate-sow', methods=['POST'])
 def generate_sow():
     try:
-        # Get the request data
         data = request.get_json()
-        
-        # Extract necessary fields (modify based on your form fields)
-        sow_type= data.get("sowType", "Unknown")
-        work_type = data.get("workType", "Unknown")
-        project_objectives = data.get("projectObjectives", "NA")
-        project_scope = data.get("projectScope", "NA")
-        detailed_desc = data.get("servicesDescription", "NA")
-        specific_feature = data.get("specificFeatures", "NA")
-        platform_tech = data.get("platformsTechnologies", "NA")
-        integrations = data.get("integrations", "NA")
-        design_specification = data.get("designSpecifications", "NA")
-        out_of_scope = data.get("outOfScope", "NA")
-        deliverables = data.get("deliverables", "NA")
-        project_timeline = data.get("timeline", "NA")
-        
+        run_async = wants_async(data)
+        inputs, user_input_id, cached, context_future = form_inputs(
+            data, prefetch_context=not run_async, check_cache=use_cache(data))
+        if cached is not None:
+            return jsonify(cached), 200
+        if run_async:
+            job = enqueue_sow_job(inputs, user_input_id)
+            return jsonify({"status": "queued", "jobId": job.id}), 202
+        response = graph_agentor.invoke(with_prefetched_context(inputs, context_future))
+        cache_generation(inputs, response)
+        return jsonify(sow_response(response)), 200
+    except QueueFullError as e:
+        return jsonify({"status": "error", "message": str(e)}), 429, {"Retry-After": "30"}
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
 
-        # Store user's query in database for future use.
-        sow_data = SOWUserInput(sow_type=sow_type, 
-                                work_type=work_type, 
-                                project_objectives=project_objectives,
-                                project_scope=project_scope,
-                                detailed_desc= detailed_desc,
-                                specific_feature=specific_feature,
-                                platform_tech=platform_tech,
-                                integrations=integrations,
-                                design_specification=design_specification,
-                                out_of_scope=out_of_scope,
-                                deliverables=deliverables,
-                                project_timeline=project_timeline)
-        db.session.add(sow_data)
-        db.session.commit()
+@app.route('/generate-sow/batch', methods=['POST'])
+def generate_sow_batch():
+    """Queue one background job per form; cached forms are answered inline."""
+    try:
+        data = request.get_json()
+        forms = data.get("forms") or []
+        if len(forms) > job_queue.max_pending - job_queue.depth():
+            return jsonify({"status": "error", "message": "Not enough room in the job queue for this batch"}), \
+                429, {"Retry-After": "30"}
+        items = []
+        for index, form in enumerate(forms):
+            inputs, user_input_id, cached, _ = form_inputs(form, check_cache=use_cache({**data, **form}))
+            if cached is not None:
+                items.append({"index": index, "status": "success", "result": cached})
+                continue
+            job = enqueue_sow_job(inputs, user_input_id)
+            items.append({"index": index, "status": "queued", "jobId": job.id})
+        return jsonify({"status": "queued", "items": items}), 202
+    except QueueFullError as e:
+        # Other requests took the room between the check and the submit.
+        return jsonify({"status": "error", "message": str(e), "items": items}), 429, {"Retry-After": "30"}
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
 
-        user_query = (
-            f"The type of SOW should be {sow_type}.\n"
-            f"The type of work is {work_type}.\n"
-            f"Objectives of project are {project_objectives}.\n"
-            f"Scope of the project is {project_scope}.\n"
-            f"Detailed Description of Services is {detailed_desc}.\n"
-            f"Specific Features are {specific_feature}.\n"
-            f"Platforms and Technologies is {platform_tech}.\n"
-            f"Integrations is {integrations}.\n"
-            f"Design Specifications are {design_specification}.\n"
-            f"Out of Scope is {out_of_scope}.\n"
-            f"Deliverables are {deliverables}.\n"
-            f"Project Timeline and Schedule is {project_timeline}."
-        )
-        user_query_map = {
-            "sow_type": sow_type,
-            "work_type": work_type,
-            "project_objectives": project_objectives,
-            "project_scope": project_scope,
-            "detailed_desc": detailed_desc,
-            "specific_feature": specific_feature,
-            "platform_tech": platform_tech,
-            "integrations": integrations,
-            "design_specification": design_specification,
-            "out_of_scope": out_of_scope,
-            "deliverables": deliverables,
-            "project_timeline": project_timeline
-        }
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = load_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found."}), 404
+    return jsonify(job.to_dict()), 200
 
-        response = graph_agentor.invoke({ 'user_query': user_query, 'query_map': user_query_map })
-        
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = load_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found."}), 404
+    if job.status == "succeeded":
+        return jsonify(job.result), 200
+    if job.status in ("queued", "running"):
+        return jsonify(job.to_dict()), 202
+    return jsonify({"status": "error", "message": job.error or f"Job {job.status}."}), 409
 
-        # Process the data (For now, we just return a formatted response)
-        sow_response = {
-            "status": "success",
-            "message": response['formatted_sow'],
-            "sow_json": response['sow'],
-            "fileName": response['doc_file_path']
-        }
-        
-        return jsonify(sow_response), 200
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = load_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found."}), 404
+    if job.status not in ("queued", "running"):
+        return jsonify({"status": "error", "message": f"Job already {job.status}."}), 409
+    outcome = job_queue.cancel(job_id)
+    if outcome == "cancelled":
+        update_job(job_id, status="cancelled", finished_at=datetime.utcnow())
+    else:
+        # Running here, or held by another worker: its runner checks the flag between graph steps.
+        update_job(job_id, cancel_requested=True)
+        outcome = "cancelling"
+    return jsonify({"jobId": job_id, "status": outcome}), 202
+
+@app.route('/generate-sow/stream', methods=['POST'])
+def generate_sow_stream():
+    try:
+        data = request.get_json()
+        inputs, _, cached, context_future = form_inputs(data, prefetch_context=True, check_cache=use_cache(data))
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
+    return stream_sow(inputs, cached, context_future)
 
 @app.route('/chat', methods=['POST'])
 def chat():
     try:
-        # Get the request data
-        data = request.get_json()
-        
-        # Extract necessary fields (modify based on your form fields)
-        user_query = data.get("message", "Unknown")
-        generated_sow = data.get("context", "Unknown")
-        
-        # Process the data (For now, we just return a formatted response)
-        response = graph_agentor.invoke({ 'user_query': user_query, 'flow': 'chat', 'previous_sow': generated_sow })
-
-        sow_response = {
-            "status": "success",
-            "message": response['formatted_sow'],
-            "sow_json": response['sow'],
-            "fileName": response['doc_file_path']
-        }
-        
-        return jsonify(sow_response), 200
+        response = graph_agentor.invoke(chat_inputs(request.get_json()))
+        return jsonify(sow_response(response)), 200
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    return stream_sow(chat_inputs(request.get_json()))
+
 @app.route('/like-sow', methods=['POST'])
 def like_sow():
     try:
@@ -145,21 +399,74 @@ def like_sow():
         # Extract necessary fields (modify based on your form fields)
         sow_content = data.get("content", "Unknown")
 
-        docs = [
-            Document(    
-                page_content=sow_content,
-                metadata={"id": str(uuid.uuid4()), "fileName": "user_generated_sow"},
-            ),
-        ]
+        # Stored in section-aware chunks; ids are content hashes, so liking
+        # the same SOW twice does not add duplicates.
+        docs = chunk_documents(sow_content, "user_generated_sow")
 
-        vector_store.add_documents(docs, ids=[doc.metadata["id"] for doc in docs])
+        get_vector_store().add_documents(docs, ids=[doc.metadata["id"] for doc in docs])
 
         return jsonify({"status": "success", "message": "SOW liked and stored successfully."}), 200
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-if __name__ == '__main__':
+@app.route('/artifacts/<request_id>/<name>', methods=['GET'])
+def download_artifact(request_id, name):
+    try:
+        data = artifact_store.get(f"{request_id}/{name}")
+    except ValueError:
+        data = None
+    if data is None:
+        return jsonify({"status": "error", "message": "Artifact not found or expired."}), 404
+
+    # Keys are content hashes, so the digest doubles as a strong ETag and the
+    # response never changes; send_file handles If-None-Match and Range.
+    digest = name.split('.')[0]
+    return send_file(
+        io.BytesIO(data),
+        mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        as_attachment=True,
+        download_name="Generated_SOW_final.docx",
+        etag=digest,
+        conditional=True,
+        max_age=ARTIFACT_TTL_SECONDS,
+    )
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify({**metrics.snapshot(), "models": model_registry.report(),
+                    "memory": model_registry.memory_usage()}), 200
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Liveness only: never touches a model, the database or Azure.
+    return jsonify({"status": "ok"}), 200
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    warm_up = model_registry.warm_up_status()
+    ready = warm_up["status"] in ("idle", "done")
+    return jsonify({"ready": ready, "warm_up": warm_up, "models": model_registry.report()}), 200 if ready else 503
+
+def initialize():
+    """One-time startup work; serve.py runs it once in the master process."""
     with app.app_context():
         db.create_all() # <--- create db object.
+        # Jobs of a process that died will never complete; jobs other live
+        # workers hold keep a fresh heartbeat and are left alone.
+        sweep_stale_jobs()
+    if GENERATION_CACHE_ENABLED:
+        try:
+            # Entries drafted with older prompt templates can never be hit again.
+            generation_cache.invalidate()
+        except Exception as e:
+            print(f"❌ Could not purge stale cached generations: {e}")
+
+if __name__ == '__main__':
+    initialize()
+    if WARMUP_MODELS and WARMUP_IN_BACKGROUND:
+        model_registry.start_background_warm_up()
+    elif WARMUP_MODELS:
+        for name, stats in model_registry.warm_up().items():
+            print(f"{name}: {stats}")
     app.run(debug=True, port=8080)
@@ -0,0 +1,145 @@
+# artifact_store.py
+"""
+Content-addressed storage for generated documents.
+
+Artifacts are keyed "<request_id>/<sha256>.<extension>" so concurrent
+requests never overwrite each other, and expire after ARTIFACT_TTL_SECONDS.
+"""
+import hashlib
+import os
+import threading
+import time
+
+from config import ARTIFACT_BACKEND, ARTIFACT_DIR, ARTIFACT_TTL_SECONDS
+
+# Only sweep for expired artifacts this often when storing new ones.
+EVICTION_INTERVAL_SECONDS = 60
+
+
+class LocalDiskBackend:
+    """Stores artifacts as files under `root`; shared by every worker on the host."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"Invalid artifact key '{key}'")
+        return path
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial file.
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def created_at(self, key):
+        try:
+            return os.path.getmtime(self._path(key))
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+            os.rmdir(os.path.dirname(self._path(key)))
+        except OSError:
+            # The request directory still holds other artifacts, or is already gone.
+            pass
+
+    def keys(self):
+        for request_id in os.listdir(self.root) if os.path.isdir(self.root) else []:
+            request_dir = os.path.join(self.root, request_id)
+            for name in os.listdir(request_dir) if os.path.isdir(request_dir) else []:
+                if not name.endswith(".tmp"):
+                    yield f"{request_id}/{name}"
+
+
+class MemoryObjectBackend:
+    """
+    In-process stand-in for an object store. Artifacts live in this process
+    only, so it suits development and single-worker deployments.
+    """
+
+    def __init__(self):
+        self._objects = {}
+        self._lock = threading.Lock()
+
+    def put(self, key, data):
+        with self._lock:
+            self._objects[key] = (data, time.time())
+
+    def get(self, key):
+        with self._lock:
+            item = self._objects.get(key)
+        return item[0] if item else None
+
+    def created_at(self, key):
+        with self._lock:
+            item = self._objects.get(key)
+        return item[1] if item else None
+
+    def delete(self, key):
+        with self._lock:
+            self._objects.pop(key, None)
+
+    def keys(self):
+        with self._lock:
+            return list(self._objects)
+
+
+class ArtifactStore:
+    def __init__(self, backend, ttl_seconds=ARTIFACT_TTL_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._last_eviction = 0.0
+
+    def put(self, request_id, data, extension="docx"):
+        """Store `data` and return its key and digest (used as the ETag)."""
+        digest = hashlib.sha256(data).hexdigest()
+        key = f"{request_id}/{digest}.{extension}"
+        self.backend.put(key, data)
+        if time.time() - self._last_eviction > EVICTION_INTERVAL_SECONDS:
+            self.evict_expired()
+        return {"key": key, "digest": digest, "size": len(data)}
+
+    def _expired(self, key):
+        created_at = self.backend.created_at(key)
+        return created_at is None or time.time() - created_at > self.ttl_seconds
+
+    def get(self, key):
+        if self._expired(key):
+            self.backend.delete(key)
+            return None
+        return self.backend.get(key)
+
+    def evict_expired(self):
+        self._last_eviction = time.time()
+        evicted = 0
+        for key in list(self.backend.keys()):
+            if self._expired(key):
+                self.backend.delete(key)
+                evicted += 1
+        if evicted:
+            print(f"🧹 Evicted {evicted} expired artifact(s)")
+        return evicted
+
+
+def _create_store():
+    if ARTIFACT_BACKEND == "memory":
+        return ArtifactStore(MemoryObjectBackend())
+    return ArtifactStore(LocalDiskBackend(ARTIFACT_DIR))
+
+
+artifact_store = _create_store()
@@ -0,0 +1,177 @@
+# batch_runner.py
+"""
+Draft many SOWs from a JSONL file of query maps.
+
+Each line is a query map ({"sow_type": ..., "project_scope": ...}) or
+{"id": ..., "query_map": {...}}. Records run through the drafting graph with
+bounded concurrency; the models are warmed up once and context is retrieved
+for all records in one batch. For every record the output directory gets
+<id>.json (SOW, compliance report, artifact key) and <id>.docx (ids that
+are not plain file names are sanitized and suffixed with a hash), and
+checkpoint.jsonl records finished ids so an interrupted run resumes where it
+stopped.
+
+    python batch_runner.py forms.jsonl --output batch_out --concurrency 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import model_registry
+import vector_rag
+from artifact_store import artifact_store
+from config import BATCH_CONCURRENCY
+from graph import graph_agentor, generate_sow as render_sow
+from sow_input import complete_query_map, build_user_query
+
+CHECKPOINT_FILE = "checkpoint.jsonl"
+
+
+def load_records(path):
+    """(id, query map) for each non-empty line of a JSONL file."""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            query_map = record.get("query_map", record)
+            records.append((str(record.get("id", line_number)), complete_query_map(query_map)))
+    return records
+
+
+def load_checkpoint(output_dir):
+    """Ids that already finished successfully in an earlier run."""
+    done = set()
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short when the previous run was killed.
+                    continue
+                if entry.get("status") == "succeeded":
+                    done.add(entry["id"])
+    return done
+
+
+def retrieve_contexts(queries, concurrency):
+    """Retrieved context per distinct query, fetched as one batch."""
+    distinct = list(dict.fromkeys(queries))
+    contexts = vector_rag.get_retriever().batch(distinct, config={"max_concurrency": concurrency})
+    return dict(zip(distinct, contexts))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def file_stem(record_id):
+    """
+    A file name for a record id from the input file. Ids that are not already
+    plain names (e.g. containing "/" or "..") keep their safe characters plus a
+    hash of the full id, so they stay distinct and inside the output directory.
+    """
+    stem = re.sub(r"[^A-Za-z0-9_-]+", "_", record_id).strip("_")[:64]
+    if stem != record_id or not stem:
+        stem = f"{stem}-{hashlib.sha256(record_id.encode('utf-8')).hexdigest()[:12]}".lstrip("-")
+    return stem
+
+
+def run_record(record_id, query_map, context, output_dir):
+    stem = file_stem(record_id)
+    inputs = {
+        'user_query': build_user_query(query_map),
+        'query_map': query_map,
+        'request_id': f"batch-{stem}",
+        'additional_context': context,
+    }
+    state = graph_agentor.invoke(inputs)
+    result = {
+        "id": record_id,
+        "feedback": state.get('feedback'),
+        "error": state.get('error'),
+        "sow_json": state.get('validated_sow') or state.get('sow_data'),
+        "compliance": state.get('compliance_results'),
+        "fileName": state.get('doc_file_path'),
+    }
+    document = artifact_store.get(result["fileName"]) if result["fileName"] else None
+    if document is None and result["fileName"] and result["sow_json"]:
+        # Expired, or held by another process's in-memory store: render it again.
+        result["fileName"] = render_sow(result["sow_json"], inputs['request_id'])["fileName"]
+        document = artifact_store.get(result["fileName"])
+    with open(os.path.join(output_dir, f"{stem}.json"), "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, default=str)
+    if document is not None:
+        with open(os.path.join(output_dir, f"{stem}.docx"), "wb") as f:
+            f.write(document)
+    elif result["fileName"]:
+        print(f"⚠️ {record_id}: document {result['fileName']} is unavailable; wrote the JSON only")
+    return result
+
+
+def run_batch(records, output_dir, concurrency=BATCH_CONCURRENCY, resume=True):
+    os.makedirs(output_dir, exist_ok=True)
+    done = load_checkpoint(output_dir) if resume else set()
+    pending = [(record_id, query_map) for record_id, query_map in records if record_id not in done]
+    print(f"📋 {len(records)} records, {len(records) - len(pending)} already done, {len(pending)} to run")
+    if not pending:
+        return {"completed": 0, "failed": 0}
+
+    model_registry.warm_up()
+    contexts = retrieve_contexts([build_user_query(query_map) for _, query_map in pending], concurrency)
+
+    checkpoint_lock = threading.Lock()
+    latencies = []
+    failed = 0
+    started = time.perf_counter()
+
+    def run(record_id, query_map):
+        record_started = time.perf_counter()
+        try:
+            result = run_record(record_id, query_map, contexts[build_user_query(query_map)], output_dir)
+            entry = {"id": record_id, "status": "succeeded", "feedback": result["feedback"]}
+        except Exception as e:
+            entry = {"id": record_id, "status": "failed", "error": str(e)}
+        entry["seconds"] = round(time.perf_counter() - record_started, 3)
+        with checkpoint_lock:
+            with open(os.path.join(output_dir, CHECKPOINT_FILE), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        return entry
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="sow-batch") as executor:
+        futures = [executor.submit(run, record_id, query_map) for record_id, query_map in pending]
+        for future in as_completed(futures):
+            entry = future.result()
+            if entry["status"] == "succeeded":
+                latencies.append(entry["seconds"])
+                print(f"✅ {entry['id']} ({entry['feedback']}) in {entry['seconds']}s")
+            else:
+                failed += 1
+                print(f"❌ {entry['id']}: {entry['error']}")
+
+    elapsed = time.perf_counter() - started
+    report = {"completed": len(latencies), "failed": failed, "seconds": round(elapsed, 1),
+              "sow_per_minute": round(len(latencies) / elapsed * 60, 2)}
+    if latencies:
+        report.update({f"p{int(q * 100)}_seconds": percentile(latencies, q) for q in (0.5, 0.95, 0.99)})
+    print(f"📊 {report}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Draft SOWs for every query map in a JSONL file")
+    parser.add_argument("input", help="JSONL file of query maps")
+    parser.add_argument("--output", default="batch_output", help="Directory for results and the checkpoint")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--no-resume", action="store_true", help="Ignore the checkpoint and run every record")
+    args = parser.parse_args()
+    run_batch(load_records(args.input), args.output, args.concurrency, resume=not args.no_resume)
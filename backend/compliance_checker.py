@@ -1,19 +1,76 @@
 # compliance_checker.py
-import spacy
-from transformers import pipeline
 from datetime import datetime
 import json
+import re
+
+import model_registry
+import inference_server
+from config import CLAUSE_ANALYSIS_CHUNKED, CLAUSE_WINDOW_WORDS, CLAUSE_WINDOW_OVERLAP_SENTENCES
+from language_checker import language_checker
+from rule_engine import rule_engine, sow_to_text
+from rules import COMPLIANCE_RULES
+from section_cache import section_cache
+
+# Zero-shot clause labels and the rule in rules.py whose patterns mark a
+# passage as worth classifying for that clause.
+CLAUSE_RULES = {
+    "confidentiality": "CONF-1",
+    "termination": "TERM-1",
+    "liability": "LIAB-1",
+}
+
+# The section of a parsed draft each rule in rules.py looks for.
+RULE_FIELDS = {
+    "CONF-1": "Confidentiality",
+    "TERM-1": "Termination",
+    "IP-1": "Intellectual Property",
+    "LIAB-1": "Limitation of Liability",
+}
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+
+def _clause_prefilter(rule):
+    if rule["type"] == "regex":
+        return re.compile(rule["pattern"], re.IGNORECASE)
+    return re.compile("|".join(rf"\b{re.escape(keyword)}\b" for keyword in rule["keywords"]),
+                      re.IGNORECASE)
+
+
+CLAUSE_PREFILTERS = {label: _clause_prefilter(COMPLIANCE_RULES[rule_id])
+                     for label, rule_id in CLAUSE_RULES.items()}
+
+
+def split_windows(text, max_words=CLAUSE_WINDOW_WORDS, overlap=CLAUSE_WINDOW_OVERLAP_SENTENCES):
+    """
+    Split text into windows of whole sentences, each at most `max_words` words,
+    with `overlap` sentences repeated between neighbours. A single sentence
+    longer than the budget is cut on word boundaries.
+    """
+    sentences = []
+    for sentence in _SENTENCE_BOUNDARY.split(text):
+        words = sentence.split()
+        for start in range(0, len(words), max_words):
+            sentences.append(words[start:start + max_words])
+
+    windows = []
+    current = []
+    for words in sentences:
+        if current and sum(map(len, current)) + len(words) > max_words:
+            windows.append(" ".join(" ".join(s) for s in current))
+            current = current[-overlap:] if overlap else []
+            while current and sum(map(len, current)) + len(words) > max_words:
+                current.pop(0)
+        current.append(words)
+    if current:
+        windows.append(" ".join(" ".join(s) for s in current))
+    return windows
+
 
 class ComplianceAgent:
     def __init__(self):
-        self.nlp = spacy.load("en_core_web_sm")
-        self.clause_checker = pipeline(
-            "zero-shot-classification",
-            model="facebook/bart-large-mnli",
-            framework="pt",
-            device=-1
-        )
-       
+        # Models are shared process-wide through the registry, so creating an
+        # agent per graph pass no longer reloads spaCy or BART-MNLI.
         self.required_fields = [
             "Project Title", "Scope of Work", "Deliverables",
             "Timeline", "Payment Terms", "Confidentiality",
@@ -42,32 +99,48 @@ class ComplianceAgent:
 
     def analyze_clauses(self, text):
         """AI-powered clause analysis"""
-        clauses = ["confidentiality", "termination", "liability"]
-        results = self.clause_checker(text, clauses, multi_label=True)
+        clauses = list(CLAUSE_RULES)
+        if CLAUSE_ANALYSIS_CHUNKED:
+            scores = self.score_clauses_chunked(text, clauses)
+        else:
+            results = inference_server.classify_zero_shot([text], clauses, multi_label=True)[0]
+            scores = dict(zip(results['labels'], results['scores']))
         
         issues = []
-        for label, score in zip(results['labels'], results['scores']):
+        for label, score in sorted(scores.items(), key=lambda item: -item[1]):
             if score < 0.6:
                 issues.append(f"{label.title()} clause needs strengthening ({score:.1%} confidence)")
         return issues
 
+    def score_clauses_chunked(self, text, clauses):
+        """
+        Best score per clause over the windows that mention it. All candidate
+        windows go to the model in one call; a clause no window mentions scores 0.
+        """
+        windows = split_windows(text)
+        candidates = {label: [i for i, window in enumerate(windows) if CLAUSE_PREFILTERS[label].search(window)]
+                      for label in clauses}
+        selected = sorted({i for indices in candidates.values() for i in indices})
+        scores = dict.fromkeys(clauses, 0.0)
+        if not selected:
+            return scores
+
+        def classify_dirty(dirty):
+            results = inference_server.classify_zero_shot(list(dirty.values()), clauses, multi_label=True)
+            return {i: dict(zip(result['labels'], result['scores'])) for i, result in zip(dirty, results)}
+
+        # Windows unchanged since an earlier pass are served from the section cache.
+        model_version = f"{model_registry.model_version(model_registry.ZERO_SHOT_MODEL)}:{','.join(clauses)}"
+        window_scores = section_cache.compute("clauses", model_version, {i: windows[i] for i in selected},
+                                              classify_dirty, keyed_by_name=False)
+        for label, indices in candidates.items():
+            if indices:
+                scores[label] = max(window_scores[i][label] for i in indices)
+        return scores
+
     def check_language(self, text):
         """Language quality checks"""
-        doc = self.nlp(text)
-        issues = []
-        
-        # Passive voice detection
-        for sent in doc.sents:
-            if any(token.dep_ == "nsubjpass" for token in sent):
-                issues.append(f"Passive voice: '{sent.text}'")
-        
-        # Vague terms check
-        vague_terms = ["appropriate", "reasonable", "etc."]
-        for term in vague_terms:
-            if term in text.lower():
-                issues.append(f"Vague term used: '{term}'")
-        
-        return issues
+        return language_checker.check_text(text)
 
     def generate_report(self, sow_data):
         """Full compliance analysis"""
@@ -78,14 +151,34 @@ class ComplianceAgent:
             "language_issues": [],
             "compliance_score": 100,
             "risk_level": "low",
-            "recommendations": []
+            "recommendations": [],
+            "short_circuited": False
         }
         
-        # Structural validation
-        report["missing_fields"], report["structural_issues"] = self.validate_structure(sow_data)
-        
-        # Content analysis
+        # Deterministic rules from rules.py run first: one regex pass over the
+        # draft, cheap next to the model-based checks below.
+        rule_result = rule_engine.check(sow_to_text(sow_data))
+        report["rule_check"] = rule_result
+
+        # Structural validation. Unparsed text has no fields to look up, so the
+        # rule engine's text patterns decide which required fields are missing.
         if "sow_text" in sow_data:
+            report["missing_fields"] = rule_result["missing_fields"]
+        else:
+            report["missing_fields"], report["structural_issues"] = self.validate_structure(sow_data)
+
+        # A rule about a section already reported missing is not penalised twice.
+        report["content_issues"].extend(
+            rule["description"] for rule in rule_result["failed_rules"]
+            if RULE_FIELDS.get(rule["id"]) not in report["missing_fields"]
+        )
+
+        # A draft missing required fields is rejected anyway, so skip the
+        # model-based checks until it is complete.
+        if report["missing_fields"]:
+            report["short_circuited"] = True
+        elif "sow_text" in sow_data:
+            # Content analysis
             report["content_issues"].extend(self.analyze_clauses(sow_data["sow_text"]))
             report["language_issues"].extend(self.check_language(sow_data["sow_text"]))
         
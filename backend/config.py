@@ -11,4 +11,144 @@ AZURE_API_BASE_URL = os.getenv("AZURE_API_BASE_URL")
 AZURE_TEXT_EMBEDDING = os.getenv("AZURE_TEXT_EMBEDDING")
 AZURE_EMBEDDING_URL_PATH = os.getenv("AZURE_EMBEDDING_URL_PATH")
 POSTGRESQL_BASE_URL= os.getenv("POSTGRESQL_BASE_URL")
-EMBEDDING_COL_NAME= os.getenv("EMBEDDING_COL_NAME")
\ No newline at end of file
+EMBEDDING_COL_NAME= os.getenv("EMBEDDING_COL_NAME")
+AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-05-15")
+
+# Load the NLP models and clients at startup instead of on the first request,
+# on a background thread by default so /healthz answers immediately and
+# /readyz turns ready once they are loaded.
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "false").lower() == "true"
+WARMUP_IN_BACKGROUND = os.getenv("WARMUP_IN_BACKGROUND", "true").lower() == "true"
+
+# Number of SOW fields sent through the toxicity classifier per forward pass.
+TOXICITY_BATCH_SIZE = int(os.getenv("TOXICITY_BATCH_SIZE", "16"))
+
+# How classifier calls are executed: "direct", "batched" (in-process micro-batching)
+# or "socket" (shared sidecar started with `python inference_server.py`).
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "direct")
+INFERENCE_SOCKET_PATH = os.getenv("INFERENCE_SOCKET_PATH", "/tmp/sow-inference.sock")
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "32"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+
+# On a rejected draft, regenerate only the failing sections instead of the whole SOW.
+SOW_REPAIR_MODE = os.getenv("SOW_REPAIR_MODE", "true").lower() == "true"
+
+# Generated documents: "disk" (shared by workers on the host) or "memory" (single process).
+ARTIFACT_BACKEND = os.getenv("ARTIFACT_BACKEND", "disk")
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", os.path.join(os.path.dirname(__file__), "artifacts"))
+ARTIFACT_TTL_SECONDS = int(os.getenv("ARTIFACT_TTL_SECONDS", str(24 * 60 * 60)))
+
+# Constrain drafts to the SOW JSON schema: "off", "json_mode" or "function_calling".
+# Both need an Azure API version that supports them.
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "off")
+
+# Background generation jobs: run POST /generate-sow asynchronously by default,
+# how many jobs run at once, and how many may be queued before requests get a 429.
+ASYNC_GENERATION = os.getenv("ASYNC_GENERATION", "false").lower() == "true"
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "20"))
+# Each process refreshes the heartbeat of the jobs it holds every
+# JOB_HEARTBEAT_SECONDS; queued or running jobs whose heartbeat is older than
+# JOB_STALE_SECONDS belonged to a process that died and are marked failed.
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "120"))
+
+# Cache of complete generations keyed by the normalized form input.
+GENERATION_CACHE_ENABLED = os.getenv("GENERATION_CACHE_ENABLED", "true").lower() == "true"
+GENERATION_CACHE_TTL_SECONDS = int(os.getenv("GENERATION_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+GENERATION_CACHE_MEMORY_SIZE = int(os.getenv("GENERATION_CACHE_MEMORY_SIZE", "256"))
+GENERATION_CACHE_PERSIST = os.getenv("GENERATION_CACHE_PERSIST", "true").lower() == "true"
+
+# Semantic cache in front of the drafting and extraction LLM calls. A stored
+# completion is reused at or above SEMANTIC_CACHE_THRESHOLD cosine similarity;
+# scores above the near-miss threshold are only counted. Embeddings are the
+# Azure ones from vector_rag or a local hashing stand-in ("local").
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_FLOWS = [flow.strip() for flow in os.getenv("SEMANTIC_CACHE_FLOWS", "chat,form,extraction").split(",")]
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+SEMANTIC_CACHE_NEAR_MISS_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_NEAR_MISS_THRESHOLD", "0.90"))
+SEMANTIC_CACHE_EMBEDDINGS = os.getenv("SEMANTIC_CACHE_EMBEDDINGS", "azure")
+
+# Intra-op threads per PyTorch forward pass (0 keeps the PyTorch default). Set to
+# about half the cores so the parallel compliance and validation checks overlap.
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+
+# Zero-shot clause analysis over sentence-aligned windows of about
+# CLAUSE_WINDOW_WORDS words (BART-MNLI truncates at 1024 tokens). Only windows
+# that mention a clause's keywords are classified. "false" scores the whole text.
+CLAUSE_ANALYSIS_CHUNKED = os.getenv("CLAUSE_ANALYSIS_CHUNKED", "true").lower() == "true"
+CLAUSE_WINDOW_WORDS = int(os.getenv("CLAUSE_WINDOW_WORDS", "200"))
+CLAUSE_WINDOW_OVERLAP_SENTENCES = int(os.getenv("CLAUSE_WINDOW_OVERLAP_SENTENCES", "1"))
+
+# Language checks: sections per nlp.pipe batch and worker processes for
+# nlp.pipe (1 parses in-process).
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "32"))
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", "1"))
+
+# Per-section check results kept in memory, plus an optional SQLite file
+# that keeps them across restarts (empty disables it).
+SECTION_CACHE_SIZE = int(os.getenv("SECTION_CACHE_SIZE", "4096"))
+SECTION_CACHE_PATH = os.getenv("SECTION_CACHE_PATH", "")
+
+# Backend for the transformer classifiers: "pytorch" or "onnx" (int8 ONNX
+# Runtime models exported on first use and cached in ONNX_CACHE_DIR).
+# ONNX_QUANTIZATION is an optimum AutoQuantizationConfig preset ("avx2",
+# "avx512_vnni", "arm64") or "none". Thread counts of 0 keep the ORT defaults.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch")
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", os.path.join(os.path.dirname(__file__), "onnx_models"))
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx2")
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "0"))
+
+# serve.py (gunicorn): listen address, worker processes, threads per worker,
+# request timeout in seconds, and the registry models the master loads
+# before forking so the workers share them.
+SERVER_BIND = os.getenv("SERVER_BIND", "0.0.0.0:8080")
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "2"))
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", "4"))
+SERVER_TIMEOUT = int(os.getenv("SERVER_TIMEOUT", "300"))
+PRELOAD_MODELS = [name.strip() for name in os.getenv(
+    "PRELOAD_MODELS", "spacy_en_core_web_sm,bart_large_mnli,unbiased_toxic_roberta"
+).split(",") if name.strip()]
+
+# Records drafted at once by batch_runner.py.
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+# Approximate nearest-neighbour index on the PGVector collection (managed with
+# vector_index.py): "hnsw" or "ivfflat" and their build parameters, plus the
+# search-time settings applied to every vector store connection.
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw")
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "100"))
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+
+# Cache of embedding vectors keyed by text hash and embedding model, in memory
+# and optionally in Postgres, in front of the Azure embeddings.
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_MEMORY_SIZE = int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "2048"))
+EMBEDDING_CACHE_PERSIST = os.getenv("EMBEDDING_CACHE_PERSIST", "true").lower() == "true"
+
+# Start retrieval for synchronous form requests while the form is being saved.
+RETRIEVAL_PREFETCH = os.getenv("RETRIEVAL_PREFETCH", "true").lower() == "true"
+RETRIEVAL_PREFETCH_WORKERS = int(os.getenv("RETRIEVAL_PREFETCH_WORKERS", "4"))
+
+# Retriever used for drafting context: "mmr" (PGVector only) or "hybrid"
+# (full-text and vector search fused with reciprocal rank fusion; run
+# `python hybrid_retriever.py setup` first). The vector half gets
+# VECTOR_SEARCH_BUDGET_MS before lexical results are used alone.
+RETRIEVER_MODE = os.getenv("RETRIEVER_MODE", "mmr")
+HYBRID_K = int(os.getenv("HYBRID_K", "2"))
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "10"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+VECTOR_SEARCH_BUDGET_MS = float(os.getenv("VECTOR_SEARCH_BUDGET_MS", "1500"))
+
+# Vector store behind retrieval and /like-sow: "pgvector" or "local" (a
+# memory-mapped matrix in LOCAL_VECTOR_STORE_DIR, float32 or float16; fill it
+# with `python local_vector_store.py export`). Hybrid retrieval needs
+# pgvector, and with "local" set EMBEDDING_CACHE_PERSIST=false to run
+# without Postgres.
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pgvector")
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", "vector_store")
+LOCAL_VECTOR_DTYPE = os.getenv("LOCAL_VECTOR_DTYPE", "float32")
@@ -0,0 +1,123 @@
+# embedding_cache.py
+"""
+Cache of embedding vectors keyed by text hash and embedding model.
+
+CachedEmbeddings wraps any LangChain Embeddings: texts already seen are
+answered from an in-memory LRU tier or a Postgres table shared by every
+worker, and only the rest are sent to the wrapped model, in one call.
+Query and document embeddings share entries, as they do for the Azure model.
+"""
+import hashlib
+import os
+import threading
+from datetime import datetime
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from langchain_core.embeddings import Embeddings
+
+import metrics
+from lru import LRUCache
+from config import POSTGRESQL_BASE_URL, EMBEDDING_CACHE_MEMORY_SIZE, EMBEDDING_CACHE_PERSIST
+
+_metadata = sa.MetaData()
+embedding_cache_table = sa.Table(
+    "embedding_cache", _metadata,
+    sa.Column("key", sa.String(64), primary_key=True),
+    sa.Column("model", sa.String(200), nullable=False),
+    sa.Column("embedding", postgresql.ARRAY(sa.REAL), nullable=False),
+    sa.Column("created_at", sa.DateTime, nullable=False),
+)
+
+
+def cache_key(model, text):
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class PostgresTier:
+    def __init__(self, url):
+        self.url = url
+        self._engine = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        with self._lock:
+            if self._engine is not None and self._pid != os.getpid():
+                # Forked from the process that created it: leave the parent's
+                # pooled connections alone and open new ones here.
+                self._engine.dispose(close=False)
+                self._engine = None
+            if self._engine is None:
+                self._engine = sa.create_engine(self.url, pool_pre_ping=True)
+                self._pid = os.getpid()
+                _metadata.create_all(self._engine, tables=[embedding_cache_table])
+            return self._engine
+
+    def get_many(self, keys):
+        table = embedding_cache_table
+        with self.engine.connect() as conn:
+            rows = conn.execute(sa.select(table.c.key, table.c.embedding).where(table.c.key.in_(keys)))
+            return {key: list(embedding) for key, embedding in rows}
+
+    def set_many(self, model, items):
+        now = datetime.utcnow()
+        rows = [{"key": key, "model": model, "embedding": embedding, "created_at": now}
+                for key, embedding in items.items()]
+        with self.engine.begin() as conn:
+            conn.execute(postgresql.insert(embedding_cache_table).values(rows).on_conflict_do_nothing())
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings, model, memory_size=EMBEDDING_CACHE_MEMORY_SIZE,
+                 persistent=EMBEDDING_CACHE_PERSIST):
+        self.embeddings = embeddings
+        self.model = model
+        self.memory = LRUCache(memory_size)
+        self.postgres = PostgresTier(f"postgresql://{POSTGRESQL_BASE_URL}") if persistent else None
+
+    def _lookup(self, keys):
+        found = {}
+        for key in keys:
+            vector = self.memory.get(key)
+            if vector is not None:
+                found[key] = vector
+        missing = [key for key in keys if key not in found]
+        if missing and self.postgres is not None:
+            try:
+                stored = self.postgres.get_many(missing)
+            except Exception as e:
+                print(f"❌ Embedding cache lookup failed: {e}")
+                stored = {}
+            for key, vector in stored.items():
+                self.memory.set(key, vector)
+            found.update(stored)
+        return found
+
+    def _store(self, items):
+        for key, vector in items.items():
+            self.memory.set(key, vector)
+        if self.postgres is not None and items:
+            try:
+                self.postgres.set_many(self.model, items)
+            except Exception as e:
+                print(f"❌ Embedding cache write failed: {e}")
+
+    def _embed(self, texts, embed_missing):
+        keys = [cache_key(self.model, text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        metrics.increment("embedding_cache.hit", len(texts) - len(missing))
+        metrics.increment("embedding_cache.miss", len(missing))
+        if missing:
+            computed = dict(zip(missing, embed_missing(list(missing.values()))))
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts):
+        return self._embed(texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
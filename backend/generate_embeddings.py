@@ -1,38 +1,105 @@
+"""
+Backfill sow_data.embedding for every row that does not have one yet.
+
+Rows are streamed from a server-side cursor, encoded in batches, and written
+through a staging table with one UPDATE ... FROM per batch, committed as it
+goes. Only rows whose embedding is still NULL are updated, so the script can
+be stopped and rerun (or run twice) safely.
+
+    python generate_embeddings.py --batch-size 256 --processes 4
+"""
+import argparse
+import os
+import time
+
 import psycopg2
+from psycopg2.extras import execute_values
 from sentence_transformers import SentenceTransformer
-import numpy as np
-
-# Load pre-trained embedding model
-model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
-# Connect to PostgreSQL
-conn = psycopg2.connect(
-    dbname="mydatabase",
-    user="postgres",
-    password="Admin1234",
-    host="localhost",
-    port="5432"
-)
-cursor = conn.cursor()
-
-# Fetch SOWs without embeddings
-cursor.execute("SELECT id, content FROM sow_data WHERE embedding IS NULL;")
-rows = cursor.fetchall()
-
-# Generate embeddings and update database
-for row in rows:
-    sow_id, content = row
-    embedding_array = model.encode(content)
-    print(f"Embedding shape: {len(embedding_array)}")
-
-    # Store embeddings as a vector
-    cursor.execute(
-        "UPDATE sow_data SET embedding = %s WHERE id = %s",
-        (embedding_array.tolist(), sow_id)
-    )
-    print(f"✅ Embedding stored for SOW ID: {sow_id}")
-
-# Commit changes
-conn.commit()
-cursor.close()
-conn.close()
-print("🎉 All embeddings stored successfully!")
+
+MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+
+def connect(args):
+    return psycopg2.connect(dbname=args.dbname, user=args.user, password=args.password,
+                            host=args.host, port=args.port)
+
+
+def encode(model, texts, args, pool):
+    if pool is not None:
+        return model.encode_multi_process(texts, pool, batch_size=args.encode_batch_size)
+    return model.encode(texts, batch_size=args.encode_batch_size, convert_to_numpy=True)
+
+
+def backfill(args):
+    # Load pre-trained embedding model
+    model = SentenceTransformer(MODEL_NAME)
+    pool = model.start_multi_process_pool(["cpu"] * args.processes) if args.processes > 1 else None
+
+    # Reads and writes use separate connections: committing a batch must not
+    # close the server-side cursor that is still streaming rows.
+    read_conn = connect(args)
+    write_conn = connect(args)
+    write_cursor = write_conn.cursor()
+    write_cursor.execute("CREATE TEMP TABLE embedding_staging AS SELECT id, embedding FROM sow_data WITH NO DATA;")
+    write_conn.commit()
+
+    # Fetch SOWs without embeddings
+    read_cursor = read_conn.cursor(name="embedding_backfill")
+    read_cursor.itersize = args.batch_size
+    query = "SELECT id, content FROM sow_data WHERE embedding IS NULL ORDER BY id"
+    read_cursor.execute(query + (f" LIMIT {int(args.limit)}" if args.limit else "") + ";")
+
+    stored = 0
+    started = time.perf_counter()
+    try:
+        while True:
+            rows = read_cursor.fetchmany(args.batch_size)
+            if not rows:
+                break
+            ids = [sow_id for sow_id, _ in rows]
+            embeddings = encode(model, [content or "" for _, content in rows], args, pool)
+
+            # Store embeddings as a vector
+            execute_values(
+                write_cursor,
+                "INSERT INTO embedding_staging (id, embedding) VALUES %s",
+                [(sow_id, embedding.tolist()) for sow_id, embedding in zip(ids, embeddings)],
+                page_size=args.batch_size,
+            )
+            write_cursor.execute(
+                "UPDATE sow_data SET embedding = staging.embedding FROM embedding_staging AS staging "
+                "WHERE sow_data.id = staging.id AND sow_data.embedding IS NULL;"
+            )
+            updated = write_cursor.rowcount
+            write_cursor.execute("TRUNCATE embedding_staging;")
+            write_conn.commit()
+
+            stored += updated
+            elapsed = time.perf_counter() - started
+            print(f"✅ Stored {updated}/{len(rows)} embeddings (up to SOW ID {ids[-1]}); "
+                  f"{stored} total, {stored / elapsed:.1f} rows/sec")
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+        read_cursor.close()
+        read_conn.close()
+        write_cursor.close()
+        write_conn.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"🎉 Stored {stored} embeddings in {elapsed:.1f}s ({stored / max(elapsed, 1e-9):.1f} rows/sec)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill missing SOW embeddings")
+    # Connect to PostgreSQL; the standard PG* variables override the defaults.
+    parser.add_argument("--dbname", default=os.getenv("PGDATABASE", "mydatabase"))
+    parser.add_argument("--user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PGPASSWORD", "Admin1234"))
+    parser.add_argument("--host", default=os.getenv("PGHOST", "localhost"))
+    parser.add_argument("--port", default=os.getenv("PGPORT", "5432"))
+    parser.add_argument("--batch-size", type=int, default=256, help="Rows fetched, encoded and committed together")
+    parser.add_argument("--encode-batch-size", type=int, default=32, help="Texts per model forward pass")
+    parser.add_argument("--processes", type=int, default=1, help="Encoder processes (1 encodes in-process)")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many rows")
+    backfill(parser.parse_args())
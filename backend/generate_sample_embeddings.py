@@ -1,4 +1,4 @@
-from vector_rag import vector_store
+from vector_rag import get_vector_store
 import uuid
 from langchain_core.documents import Document
 
@@ -72,4 +72,4 @@ Insert fee details (time and materials/fixed fee) and total budget agreement. In
         ),
     ]
 
-vector_store.add_documents(docs, ids=[doc.metadata["id"] for doc in docs])
\ No newline at end of file
+get_vector_store().add_documents(docs, ids=[doc.metadata["id"] for doc in docs])
\ No newline at end of file
@@ -0,0 +1,165 @@
+# generation_cache.py
+"""
+Cache of complete SOW generations keyed by the normalized form input.
+
+Keys combine the query map with the prompt version and the model deployment,
+so editing a template in prompt.py or switching deployments never serves a
+stale draft. Entries live in an in-memory LRU tier and, optionally, in a
+Postgres table shared by every worker.
+
+    python generation_cache.py --invalidate        # drop entries from older prompt versions
+    python generation_cache.py --invalidate --all  # drop everything
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+import metrics
+import prompt
+from lru import LRUCache
+from config import (
+    AZURE_DEPLOYMENT_NAME, POSTGRESQL_BASE_URL,
+    GENERATION_CACHE_MEMORY_SIZE, GENERATION_CACHE_TTL_SECONDS, GENERATION_CACHE_PERSIST,
+)
+
+# Changes whenever any drafting template changes.
+PROMPT_VERSION = hashlib.sha256("\n".join([
+    prompt.system_template, prompt.user_template,
+    prompt.user_chat_prompt, prompt.user_repair_prompt,
+]).encode("utf-8")).hexdigest()[:16]
+
+_metadata = sa.MetaData()
+generation_cache_table = sa.Table(
+    "sow_generation_cache", _metadata,
+    sa.Column("key", sa.String(64), primary_key=True),
+    sa.Column("prompt_version", sa.String(16), nullable=False, index=True),
+    sa.Column("deployment", sa.String(200), nullable=True),
+    sa.Column("value", sa.JSON, nullable=False),
+    sa.Column("created_at", sa.DateTime, nullable=False),
+    sa.Column("expires_at", sa.DateTime, nullable=False, index=True),
+)
+
+
+def normalize_query_map(query_map):
+    """Collapse whitespace so trivially different submissions share a key."""
+    return {
+        key: re.sub(r"\s+", " ", value).strip() if isinstance(value, str) else value
+        for key, value in query_map.items()
+    }
+
+
+def cache_key(query_map):
+    canonical = json.dumps({
+        "query_map": normalize_query_map(query_map),
+        "prompt_version": PROMPT_VERSION,
+        "deployment": AZURE_DEPLOYMENT_NAME,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class PostgresTier:
+    def __init__(self, url, ttl_seconds):
+        self.url = url
+        self.ttl_seconds = ttl_seconds
+        self._engine = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        with self._lock:
+            if self._engine is not None and self._pid != os.getpid():
+                # Forked from the process that created it: leave the parent's
+                # pooled connections alone and open new ones here.
+                self._engine.dispose(close=False)
+                self._engine = None
+            if self._engine is None:
+                self._engine = sa.create_engine(self.url, pool_pre_ping=True)
+                self._pid = os.getpid()
+                _metadata.create_all(self._engine, tables=[generation_cache_table])
+            return self._engine
+
+    def get(self, key):
+        query = sa.select(generation_cache_table.c.value).where(
+            generation_cache_table.c.key == key,
+            generation_cache_table.c.expires_at > datetime.utcnow(),
+        )
+        with self.engine.connect() as conn:
+            return conn.execute(query).scalar()
+
+    def set(self, key, value):
+        now = datetime.utcnow()
+        row = {
+            "key": key, "prompt_version": PROMPT_VERSION, "deployment": AZURE_DEPLOYMENT_NAME,
+            "value": value, "created_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl_seconds),
+        }
+        with self.engine.begin() as conn:
+            conn.execute(generation_cache_table.delete().where(generation_cache_table.c.key == key))
+            conn.execute(generation_cache_table.insert().values(**row))
+
+    def invalidate(self, all_entries=False):
+        table = generation_cache_table
+        query = table.delete()
+        if not all_entries:
+            query = query.where(sa.or_(table.c.prompt_version != PROMPT_VERSION,
+                                       table.c.expires_at <= datetime.utcnow()))
+        with self.engine.begin() as conn:
+            return conn.execute(query).rowcount
+
+
+class GenerationCache:
+    def __init__(self, memory_size=GENERATION_CACHE_MEMORY_SIZE,
+                 ttl_seconds=GENERATION_CACHE_TTL_SECONDS, persistent=GENERATION_CACHE_PERSIST):
+        self.memory = LRUCache(memory_size, ttl_seconds)
+        self.postgres = PostgresTier(f"postgresql://{POSTGRESQL_BASE_URL}", ttl_seconds) if persistent else None
+
+    def get(self, query_map):
+        key = cache_key(query_map)
+        value = self.memory.get(key)
+        if value is None and self.postgres is not None:
+            try:
+                value = self.postgres.get(key)
+            except Exception as e:
+                print(f"❌ Generation cache lookup failed: {e}")
+            if value is not None:
+                self.memory.set(key, value)
+        metrics.increment("generation_cache.hit" if value is not None else "generation_cache.miss")
+        return value
+
+    def set(self, query_map, value):
+        key = cache_key(query_map)
+        self.memory.set(key, value)
+        if self.postgres is not None:
+            try:
+                self.postgres.set(key, value)
+            except Exception as e:
+                print(f"❌ Generation cache write failed: {e}")
+
+    def invalidate(self, all_entries=False):
+        """Drop entries from older prompt versions (or every entry)."""
+        self.memory.clear()
+        if self.postgres is None:
+            return 0
+        return self.postgres.invalidate(all_entries)
+
+
+generation_cache = GenerationCache()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the SOW generation cache")
+    parser.add_argument("--invalidate", action="store_true", help="Remove stale cache entries")
+    parser.add_argument("--all", action="store_true", help="With --invalidate, remove every entry")
+    args = parser.parse_args()
+    if args.invalidate:
+        removed = generation_cache.invalidate(all_entries=args.all)
+        print(f"🧹 Removed {removed} cached generation(s); prompt version is {PROMPT_VERSION}")
+    else:
+        parser.print_help()
@@ -1,20 +1,27 @@
 from typing_extensions import TypedDict
-from llm import model
-from prompt import drafting_prompt_template, drafting_chat_prompt
-from vector_rag import retriever
+import llm
+from prompt import drafting_prompt_template, drafting_chat_prompt, drafting_repair_prompt, SOW_JSON_KEYS, sow_json_schema
+import vector_rag
+from config import TOXICITY_BATCH_SIZE, SOW_REPAIR_MODE, STRUCTURED_OUTPUT
 from langgraph.graph import StateGraph, START, END
-import os
+from langgraph.config import get_stream_writer
+import io
+import time
+import uuid
 import docx
 import json
 import re
-from transformers import pipeline
 from docx.shared import Pt
 
 # using the new ComplianceAgent from compliance_checker.py.
 from compliance_checker import ComplianceAgent
-
-# Initialize the toxicity classifier.
-toxicity_classifier = pipeline("text-classification", model="unitary/unbiased-toxic-roberta")
+import inference_server
+import model_registry
+from section_cache import section_cache
+import metrics
+from artifact_store import artifact_store
+from json_repair import repair_json
+import semantic_cache
 
 # Define our state
 class State(TypedDict, total=False):
@@ -30,35 +37,134 @@ class State(TypedDict, total=False):
     feedback: str
     error: str
     retryCount: int
-    doc_file_path: str
+    doc_file_path: str  # Artifact key of the generated DOCX.
+    request_id: str
+    sow_data: dict      # Parsed SOW of the latest draft, when it is valid JSON.
+    failing_keys: list  # Sections rejected by compliance or validation.
+    # Written by the parallel check branches and merged by join_checks.
+    compliance_error: str
+    compliance_failing_keys: list
+    validation_error: str
+    validation_failing_keys: list
+
+# Compliance issue prefixes (clause labels and rule descriptions) and the SOW
+# section each one is drafted in.
+CLAUSE_SECTIONS = {
+    "confidentiality": "Confidentiality",
+    "termination": "Termination",
+    "liability": "Limitation of Liability",
+    "ip rights": "Intellectual Property",
+}
+
+def emit_event(event):
+    """Send a progress event to stream_mode="custom" consumers; a no-op otherwise."""
+    try:
+        get_stream_writer()(event)
+    except Exception:
+        # Not running inside a graph (e.g. a node called directly).
+        pass
+
+def traced(name, node):
+    """Wrap a node so it reports when it starts and finishes."""
+    def run(state: State):
+        emit_event({"event": "node_start", "node": name})
+        started = time.perf_counter()
+        update = node(state)
+        emit_event({"event": "node_finish", "node": name,
+                    "seconds": round(time.perf_counter() - started, 3)})
+        return update
+    return run
+
+def retrieve_context(user_query):
+    return vector_rag.get_retriever().invoke(user_query)
 
 def get_relevant_context(state: State):
-    context = retriever.invoke(state['user_query'])
+    # Batch runs and the form endpoints may have retrieved the context already.
+    context = state.get('additional_context')
+    if context is None:
+        context = retrieve_context(state['user_query'])
     return { 'additional_context': context, 'retryCount': 0 }
 
 def extract_raw_json(response_text):
     """
     Extracts and parses raw JSON from an AI response wrapped in ```json ... ```
-    or returns the raw JSON directly if no wrapping exists.
+    or returns the raw JSON directly if no wrapping exists. Malformed or
+    truncated JSON is repaired locally before giving up.
     """
-    # Pattern to capture content between ```json ... ``` or just ```
-    pattern = r"```(?:json)?\s*([\s\S]*?)```"
+    raw_json_str = response_text.strip()
+    try:
+        return json.loads(raw_json_str)
+    except json.JSONDecodeError:
+        pass
+
+    # Pattern to capture content between ```json ... ``` or just ```, when the
+    # response opens with one
+    pattern = r"^```(?:json)?\s*([\s\S]*?)```\s*$"
 
-    match = re.search(pattern, response_text.strip())
+    match = re.search(pattern, raw_json_str)
     if match:
         raw_json_str = match.group(1)
-    else:
-        raw_json_str = response_text.strip()
 
     try:
         return json.loads(raw_json_str)
     except json.JSONDecodeError as e:
+        repaired = repair_json(response_text)
+        if repaired is not None:
+            metrics.increment("sow.json_repaired")
+            return repaired
         print(f"❌ JSON parsing failed: {e}")
         return None
 
+def invoke_drafting_model(prompt):
+    """
+    Call the LLM for a full draft. With STRUCTURED_OUTPUT the response is
+    constrained to the SOW schema, either through JSON mode or by forcing a
+    function call whose arguments are the SOW sections.
+    """
+    if STRUCTURED_OUTPUT == "function_calling":
+        response = llm.get_chat_model().bind(
+            functions=[{"name": "submit_sow", "description": sow_json_schema["description"],
+                        "parameters": sow_json_schema}],
+            function_call={"name": "submit_sow"},
+        ).invoke(prompt)
+        function_call = response.additional_kwargs.get("function_call") or {}
+        return function_call.get("arguments") or response.content
+    if STRUCTURED_OUTPUT == "json_mode":
+        return llm.get_chat_model().bind(response_format={"type": "json_object"}).invoke(prompt).content
+    return llm.get_chat_model().invoke(prompt).content
+
+def repair_agent(state: State):
+    """
+    Regenerate only the failing sections of the previous draft and merge them
+    back into it. Returns None when the repair response cannot be used, so the
+    caller falls back to a full redraft.
+    """
+    sow_data = state['sow_data']
+    failing_keys = state['failing_keys']
+    failing_sections = json.dumps({key: sow_data.get(key, "") for key in failing_keys}, indent=2)
+    prompt = drafting_repair_prompt.invoke({
+        "user_query": state['user_query'],
+        "failing_sections": failing_sections,
+        "feedback": state['error'],
+    })
+    response = llm.get_chat_model().invoke(prompt)
+    repaired = extract_raw_json(response.content)
+    if not isinstance(repaired, dict):
+        return None
+
+    repaired_keys = [key for key in failing_keys if key in repaired]
+    if not repaired_keys:
+        return None
+    merged = {**sow_data, **{key: repaired[key] for key in repaired_keys}}
+    print(f"🔧 Repaired sections: {', '.join(repaired_keys)}")
+    return { 'sow': json.dumps(merged), 'sow_data': merged }
 
 def drafting_agent(state: State):
     if state.get('error'):
+        if SOW_REPAIR_MODE and state.get('sow_data') and state.get('failing_keys'):
+            repaired = repair_agent(state)
+            if repaired:
+                return repaired
         previous_content = state.get('sow', '')
         instruction = (f"Below is the previously generated content: {previous_content} "
                        f"The following errors were detected: {state['error']}. "
@@ -72,8 +178,7 @@ def drafting_agent(state: State):
             "previous_sow": state['previous_sow'],
             "feedback": instruction,
         })
-        response = model.invoke(prompt)
-        return { 'sow': response.content }
+        flow, cache_context = 'chat', state['previous_sow'] + instruction
     else: 
         prompt = drafting_prompt_template.invoke({
             "query": state['user_query'],
@@ -81,24 +186,35 @@ def drafting_agent(state: State):
             "feedback": instruction,
             **state['query_map']
         })
-        response = model.invoke(prompt)
-        return { 'sow': response.content }
+        flow, cache_context = 'form', semantic_cache.form_context(state['query_map'], instruction)
+    # Only the user's request is matched semantically; the SOW being edited,
+    # the form values and any error feedback must match exactly.
+    content = semantic_cache.cached_invoke(
+        flow, state['user_query'], lambda: invoke_drafting_model(prompt),
+        context=cache_context, accept=lambda completion: repair_json(completion) is not None,
+    )
+    sow_data = extract_raw_json(content)
+    return {
+        'sow': content,
+        'sow_data': sow_data if isinstance(sow_data, dict) else None,
+    }
 
 def compliance_agent(state: State):
     # Use the  ComplianceAgent to analyze the SOW.
     agent = ComplianceAgent()
-    try:
-        # Attempt to parse the SOW as JSON
-        sow_data = json.loads(state['sow'])
-    except Exception:
-        # If parsing fails, treat the entire text as the content to check.
+    sow_data = state.get('sow_data')
+    if sow_data is None:
+        # If parsing failed, treat the entire text as the content to check.
         sow_data = {"sow_text": state['sow']}
     
     # Generate the compliance report using the new agent.
     report = agent.generate_report(sow_data)
-    state['compliance_results'] = report
+    emit_event({"event": "compliance", "compliance_score": report["compliance_score"],
+                "risk_level": report["risk_level"], "missing_fields": report["missing_fields"]})
     
     # If any compliance issues are detected, build a brief error message and set it on the state.
+    error_message = None
+    failing_keys = []
     if (report["compliance_score"] < 80 or
         report["missing_fields"] or
         report["structural_issues"] or
@@ -114,88 +230,162 @@ def compliance_agent(state: State):
         if report["language_issues"]:
             error_message += f"Language issues: {', '.join(report['language_issues'])}. "
         error_message += f"Risk Level: {report['risk_level']}"
-        state['error'] = error_message
-    return state
 
-def validate_text(text, threshold=0.75):
-    try:
-        result = toxicity_classifier(text)[0]
-    except Exception as e:
-        return text, None
-    
-    toxic_labels = [
-        "toxicity", "severe_toxicity", "obscene", "threat",
-        "insult", "identity_attack", "sexual_explicit"
-    ]
-    if result['label'] in toxic_labels and result['score'] > threshold:
+        failing_keys = list(report["missing_fields"])
+        failing_keys += [field for field in agent.required_fields
+                         if isinstance(sow_data.get(field), str) and not sow_data[field].strip()]
+        failing_keys += [section for label, section in CLAUSE_SECTIONS.items()
+                         if any(issue.lower().startswith(label) for issue in report["content_issues"])]
+    # The error is always written so a clean pass clears the previous iteration's error.
+    return {
+        'compliance_results': report,
+        'compliance_error': error_message,
+        'compliance_failing_keys': list(dict.fromkeys(failing_keys)),
+    }
+
+TOXIC_LABELS = [
+    "toxicity", "severe_toxicity", "obscene", "threat",
+    "insult", "identity_attack", "sexual_explicit"
+]
+
+def _toxicity_error(text, result, threshold):
+    if result['label'] in TOXIC_LABELS and result['score'] > threshold:
         error_msg = (f"[⚠ TOXIC CONTENT DETECTED] Text validation failed: {text}. "
                      f"Reason: {result['label']} with score {round(result['score']*100, 2)}%")
         print(error_msg)
-        return text, error_msg
-    return text, None
-
-def validate_sow_data(sow_data):
-    validated_data = {}
-    errors = {}
-    for key, value in sow_data.items():
-        if isinstance(value, dict):
-            validated_subsection = {}
-            subsection_errors = {}
-            for subkey, subvalue in value.items():
-                valid_text, error = validate_text(subvalue)
-                validated_subsection[subkey] = valid_text
-                if error:
-                    subsection_errors[subkey] = error
-            validated_data[key] = validated_subsection
-            if subsection_errors:
-                errors[key] = subsection_errors
-        else:
-            valid_text, error = validate_text(value)
-            validated_data[key] = valid_text
-            if error:
-                errors[key] = error
+        return error_msg
+    return None
+
+def _string_leaves(value, path=()):
+    """Yield (path, text) for every non-empty string inside nested dicts and lists."""
+    if isinstance(value, str):
+        if value.strip():
+            yield path, value
+    elif isinstance(value, dict):
+        for key, subvalue in value.items():
+            yield from _string_leaves(subvalue, path + (key,))
+    elif isinstance(value, (list, tuple)):
+        for index, item in enumerate(value):
+            yield from _string_leaves(item, path + (index,))
+
+def validate_texts(texts, threshold=0.75, batch_size=TOXICITY_BATCH_SIZE, failed=None):
+    """
+    Toxicity check for a list of texts: returns one error (or None) per text.
+    Texts are sorted by length before batching so every batch pads to a similar
+    length, and results are restored to the input order. Indices of texts the
+    classifier could not score are appended to `failed`.
+    """
+    errors = [None] * len(texts)
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        batch = [texts[i] for i in bucket]
+        try:
+            results = inference_server.classify_toxicity(batch)
+        except Exception as e:
+            # Fall back to one call per text so a single bad input does not
+            # hide the verdicts for the rest of the batch.
+            results = None
+        for position, index in enumerate(bucket):
+            if results is None:
+                try:
+                    result = inference_server.classify_toxicity([texts[index]])[0]
+                except Exception as e:
+                    if failed is not None:
+                        failed.append(index)
+                    continue
+            else:
+                result = results[position]
+            errors[index] = _toxicity_error(texts[index], result, threshold)
+    return errors
+
+def validate_sow_data(sow_data, batch_size=TOXICITY_BATCH_SIZE, threshold=0.75):
+    """
+    Validate every string in the SOW with batched toxicity inference.
+
+    Errors keep their existing shape: top-level fields map to a message, and
+    fields holding a dict map to {subkey: message}. Strings nested deeper than
+    that report the first failing message at their subkey. Verdicts are cached
+    per field, so only fields whose content changed are classified again.
+    """
+    def validate_dirty(sections):
+        leaves = list(_string_leaves(sections))
+        failed = []
+        leaf_errors = validate_texts([text for _, text in leaves], threshold, batch_size, failed)
+
+        section_errors = dict.fromkeys(sections)
+        for (path, _), error in zip(leaves, leaf_errors):
+            if not error:
+                continue
+            key = path[0]
+            if isinstance(sections[key], dict):
+                section_errors[key] = section_errors[key] or {}
+                section_errors[key].setdefault(path[1], error)
+            elif section_errors[key] is None:
+                section_errors[key] = error
+        # Fields the classifier could not score are not cached as clean.
+        for index in failed:
+            section_errors.pop(leaves[index][0][0], None)
+        return section_errors
+
+    model_version = f"{model_registry.model_version(model_registry.TOXICITY_MODEL)}:{threshold}"
+    section_errors = section_cache.compute("toxicity", model_version, sow_data, validate_dirty)
+    errors = {key: error for key, error in section_errors.items() if error}
+    # Values are returned unchanged, as before.
+    validated_data = dict(sow_data)
     return validated_data, errors
 
 def extract_json_from_sow(raw_sow: str) -> dict:
+    keys = ", ".join(f'"{key}"' for key in SOW_JSON_KEYS)
     extraction_prompt = (
-        '''
-        Extract the following fields from the given Statement of Work into a JSON object with these keys: 
-        "Project Name", "End Date", "Confidentiality", "Intellectual Property", "Termination", "Project Title", "Start Date", "End Date", "Project Name", "SOW Effective Date","Company Information", "Client", "Agreement Date",
-"Client Contact", "Contact", "Services Description", "Deliverables",
-"Milestones", "Acceptance", "Personnel and Locations", "Representatives",
-"Client Representatives", "Contractor Resources", "Terms & Conditions", "Fees", "Expenses",
-"Taxes", "Conversion", "Limitation of Liability", "Service Level Agreement", "Assumptions", "Scope of Work",
-"Change Process", "Payment Terms", "Timeline", "Company Name", "Client Name",
-''' + raw_sow +
+        f"Extract the following fields from the given Statement of Work into a JSON object with these keys: {keys}\n"
+        + raw_sow +
         "\n\nOutput the result as a valid JSON and do not format just return pure json."
     )
-    response = model.invoke(extraction_prompt)
-    try:
-        sow_data = json.loads(response.content)
-        return sow_data
-    except Exception as e:
-        raise ValueError("Failed to extract JSON from SOW content: " + str(e))
+    # Keyed on the exact text: similar SOWs for different clients must not share fields.
+    content = semantic_cache.cached_invoke(
+        'extraction', raw_sow, lambda: llm.get_chat_model().invoke(extraction_prompt).content,
+        context=raw_sow, accept=lambda completion: isinstance(repair_json(completion), dict),
+    )
+    sow_data = repair_json(content)
+    if not isinstance(sow_data, dict):
+        raise ValueError("Failed to extract JSON from SOW content: " + content[:200])
+    return sow_data
 
 def validation_agent(state: State):
     try:
-        try:
-            sow_data = json.loads(state['sow'])
-        except Exception as parse_error:
+        update = {}
+        sow_data = state.get('sow_data')
+        if sow_data is None:
+            # Only reached when even the local repair parser could not read the draft.
+            metrics.increment("sow.json_extraction_fallback")
             sow_data = extract_json_from_sow(state['sow'])
+            update['sow_data'] = sow_data
+
+        # Always the whole draft: a repair may leave a failing section out, and
+        # the section cache makes the unchanged sections cheap to re-check.
+        _, errors = validate_sow_data(sow_data)
 
-        validated_data, errors = validate_sow_data(sow_data)
         if errors:
-            state['error'] = json.dumps(errors)
-            return { 'feedback': 'REJECTED', 'retryCount': state['retryCount'] + 1 }
-        else:
-            state['validated_sow'] = validated_data
-            state.pop('error', None)
-            return { 'feedback': 'ACCEPTED', 'validated_sow': validated_data }
+            return { **update, 'validation_error': json.dumps(errors), 'validation_failing_keys': list(errors) }
+        return { **update, 'validation_error': None, 'validation_failing_keys': [], 'validated_sow': dict(sow_data) }
     except Exception as e:
-        state['error'] = str(e)
-        return { 'feedback': 'REJECTED', 'retryCount': state['retryCount'] + 1 }
-
-def generate_sow(sow_data, output_filename="Generated_SOW_final.docx"):
+        return { 'validation_error': str(e), 'validation_failing_keys': [] }
+
+def join_checks(state: State):
+    """Merge the compliance and validation branches into one routing decision."""
+    errors = [error for error in (state.get('compliance_error'), state.get('validation_error')) if error]
+    failing_keys = list(dict.fromkeys(
+        (state.get('compliance_failing_keys') or []) + (state.get('validation_failing_keys') or [])
+    ))
+    if errors:
+        return {
+            'feedback': 'REJECTED', 'retryCount': state['retryCount'] + 1,
+            'error': " ".join(errors), 'failing_keys': failing_keys,
+        }
+    return { 'feedback': 'ACCEPTED', 'error': None, 'failing_keys': [] }
+
+def generate_sow(sow_data, request_id=None):
     markdown = ''
     newLineChar = '\n\n'
     doc = docx.Document()
@@ -263,18 +453,17 @@ def generate_sow(sow_data, output_filename="Generated_SOW_final.docx"):
     doc.add_paragraph(f"{sow_data['Company Name'] or ''} Signature: ________________")
     markdown += f"{sow_data['Company Name'] or ''} Signature: ________________{newLineChar}"
 
-    static_folder = os.path.join(os.path.dirname(__file__), 'static')
-    if not os.path.exists(static_folder):
-        os.makedirs(static_folder)
+    # Render in memory and store under this request, so concurrent requests
+    # never overwrite each other's documents.
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    artifact = artifact_store.put(request_id or str(uuid.uuid4()), buffer.getvalue())
 
-    output_path = os.path.join(static_folder, output_filename)
-    doc.save(output_path)
-
-    print(f"✅ SOW document generated: {output_filename}")
-    return { "fileName": output_filename, "formatted_sow_md": markdown }
+    print(f"✅ SOW document generated: {artifact['key']}")
+    return { "fileName": artifact['key'], "formatted_sow_md": markdown }
 
 def formatting_agent(state: State):
-    output_file = generate_sow(state['validated_sow'])
+    output_file = generate_sow(state['validated_sow'], state.get('request_id'))
     state['doc_file_path'] = output_file['fileName']
     state['formatted_sow'] = output_file['formatted_sow_md']
     return state
@@ -293,20 +482,25 @@ def agent_router(state: State):
 
 # ---- Build the Graph ----
 graph_builder = StateGraph(State)
-graph_builder.add_node('get_relevant_context', get_relevant_context)
-graph_builder.add_node('drafting_agent', drafting_agent)
-graph_builder.add_node('compliance_agent', compliance_agent)
-graph_builder.add_node('validation_agent', validation_agent)
-graph_builder.add_node('formatting_agent', formatting_agent)
+graph_builder.add_node('get_relevant_context', traced('get_relevant_context', get_relevant_context))
+graph_builder.add_node('drafting_agent', traced('drafting_agent', drafting_agent))
+graph_builder.add_node('compliance_agent', traced('compliance_agent', compliance_agent))
+graph_builder.add_node('validation_agent', traced('validation_agent', validation_agent))
+graph_builder.add_node('join_checks', join_checks)
+graph_builder.add_node('formatting_agent', traced('formatting_agent', formatting_agent))
 
 graph_builder.add_edge(START, 'get_relevant_context')
 graph_builder.add_edge('get_relevant_context', 'drafting_agent')
+# Compliance and validation are independent reads of the same draft, so they
+# run as parallel branches (LangGraph executes them on separate threads and
+# the model forward passes release the GIL) and join before routing.
 graph_builder.add_edge('drafting_agent', 'compliance_agent')
-graph_builder.add_edge('compliance_agent', 'validation_agent')
+graph_builder.add_edge('drafting_agent', 'validation_agent')
+graph_builder.add_edge(['compliance_agent', 'validation_agent'], 'join_checks')
 
 # Route based on validation and compliance feedback.
 graph_builder.add_conditional_edges(
-    "validation_agent",
+    "join_checks",
     agent_router,
     {
         'SUCCESS': 'formatting_agent',
@@ -316,4 +510,23 @@ graph_builder.add_conditional_edges(
 
 graph_builder.add_edge('formatting_agent', END)
 
-graph_agentor = graph_builder.compile()
\ No newline at end of file
+graph_agentor = graph_builder.compile()
+
+def stream_graph(inputs):
+    """
+    Run the graph and yield (event, data) pairs as it progresses: node_start /
+    node_finish and compliance events, LLM tokens from the drafting agent, and
+    a final event carrying the complete state.
+    """
+    final_state = None
+    for mode, chunk in graph_agentor.stream(inputs, stream_mode=["custom", "messages", "values"]):
+        if mode == "custom":
+            event = dict(chunk)
+            yield event.pop("event"), event
+        elif mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") == "drafting_agent" and message.content:
+                yield "token", {"content": message.content}
+        else:
+            final_state = chunk
+    yield "final", final_state
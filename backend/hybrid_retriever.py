@@ -0,0 +1,195 @@
+# hybrid_retriever.py
+"""
+Hybrid retrieval: Postgres full-text search fused with PGVector similarity.
+
+Chunks get a generated tsvector column with a GIN index on the PGVector
+table. A query runs a lexical search (its content words OR-ed, ranked
+with ts_rank_cd) and a vector search side by side, and the two rankings are
+merged with reciprocal rank fusion. The vector search, which needs a remote
+embedding call, gets VECTOR_SEARCH_BUDGET_MS; past that, or on error, the
+lexical results are returned on their own.
+
+    python hybrid_retriever.py setup                 # add the tsvector column and GIN index
+    python hybrid_retriever.py benchmark queries.txt # latency and overlap against the MMR retriever
+"""
+import argparse
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List
+
+import sqlalchemy as sa
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import metrics
+from sow_input import build_user_query, complete_query_map
+from config import EMBEDDING_COL_NAME, HYBRID_K, HYBRID_FETCH_K, RRF_K, VECTOR_SEARCH_BUDGET_MS
+
+EMBEDDING_TABLE = "langchain_pg_embedding"
+TSV_COLUMN = "document_tsv"
+MAX_QUERY_TERMS = 64
+
+_engine = None
+_engine_lock = threading.Lock()
+# Vector searches that overrun the budget finish in the background here.
+_vector_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="sow-vector-search")
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            from vector_rag import create_engine
+            _engine = create_engine()
+        return _engine
+
+
+def setup(engine):
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(sa.text(
+            f"ALTER TABLE {EMBEDDING_TABLE} ADD COLUMN IF NOT EXISTS {TSV_COLUMN} tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('english', coalesce(document, ''))) STORED"
+        ))
+        conn.execute(sa.text(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{EMBEDDING_TABLE}_{TSV_COLUMN} "
+            f"ON {EMBEDDING_TABLE} USING gin ({TSV_COLUMN})"
+        ))
+    print(f"✅ {EMBEDDING_TABLE}.{TSV_COLUMN} and its GIN index are in place")
+
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is", "it", "its",
+    "of", "on", "or", "that", "the", "their", "this", "to", "with", "will", "should", "na", "unknown",
+}
+# Words of the build_user_query template; every form request repeats them.
+TEMPLATE_WORDS = set(re.findall(r"\w+", build_user_query(dict.fromkeys(complete_query_map({}), "")).lower()))
+
+
+def lexical_query(text):
+    """
+    An OR of the query's distinct content words in websearch syntax, which
+    never fails to parse. Template and stop words are dropped before the
+    MAX_QUERY_TERMS cut, so the budget goes to what the user typed.
+    """
+    # "or" (a stop word here) is the one word websearch_to_tsquery treats as an operator.
+    terms = [term for term in dict.fromkeys(re.findall(r"\w+", text.lower()))
+             if term not in STOP_WORDS and term not in TEMPLATE_WORDS and len(term) > 1]
+    return " or ".join(terms[:MAX_QUERY_TERMS])
+
+
+def lexical_search(query, k, collection=EMBEDDING_COL_NAME):
+    terms = lexical_query(query)
+    if not terms:
+        return []
+    with get_engine().connect() as conn:
+        rows = conn.execute(sa.text(
+            f"SELECT e.id, e.document, e.cmetadata, ts_rank_cd(e.{TSV_COLUMN}, q) AS rank "
+            f"FROM {EMBEDDING_TABLE} e JOIN langchain_pg_collection c ON c.uuid = e.collection_id, "
+            "websearch_to_tsquery('english', :terms) q "
+            f"WHERE c.name = :collection AND e.{TSV_COLUMN} @@ q ORDER BY rank DESC LIMIT :k"
+        ), {"terms": terms, "collection": collection, "k": k}).all()
+    return [Document(id=row.id, page_content=row.document, metadata=row.cmetadata or {}) for row in rows]
+
+
+def vector_search(query, k):
+    from vector_rag import get_vector_store
+    return get_vector_store().similarity_search(query, k=k)
+
+
+def _document_key(document):
+    return document.id or document.metadata.get("id") or document.page_content
+
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=RRF_K):
+    """Merge ranked document lists: each document scores sum(1 / (rrf_k + rank))."""
+    scores = {}
+    documents = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, 1):
+            key = _document_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+
+class HybridRetriever(BaseRetriever):
+    k: int = HYBRID_K
+    fetch_k: int = HYBRID_FETCH_K
+    budget_ms: float = VECTOR_SEARCH_BUDGET_MS
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        vector_future = _vector_pool.submit(vector_search, query, self.fetch_k)
+        try:
+            lexical = lexical_search(query, self.fetch_k)
+        except Exception as e:
+            print(f"❌ Lexical search failed: {e}")
+            lexical = []
+
+        try:
+            vector = vector_future.result(timeout=self.budget_ms / 1000)
+        except FutureTimeoutError:
+            metrics.increment("retrieval.vector_timeout")
+            vector = None
+        except Exception as e:
+            print(f"❌ Vector search failed: {e}")
+            metrics.increment("retrieval.vector_error")
+            vector = None
+
+        if vector is None:
+            if not lexical:
+                # Nothing to fall back on: wait for the vector search after all.
+                return vector_future.result()[:self.k]
+            metrics.increment("retrieval.lexical_fallback")
+            return lexical[:self.k]
+        return reciprocal_rank_fusion([lexical, vector], self.k)
+
+
+def _timed(search, queries):
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(search(query))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return results, sorted(latencies)
+
+
+def benchmark(queries, k):
+    from vector_rag import get_vector_store
+    mmr = get_vector_store().as_retriever(search_type="mmr", search_kwargs={"k": k})
+    hybrid = HybridRetriever(k=k)
+    runs = {
+        "mmr": _timed(mmr.invoke, queries),
+        "lexical": _timed(lambda q: lexical_search(q, k), queries),
+        "vector": _timed(lambda q: vector_search(q, k), queries),
+        "hybrid": _timed(hybrid.invoke, queries),
+    }
+
+    print(f"📊 {len(queries)} queries, k={k}")
+    print(f"{'retriever':<10} {'p50 ms':>8} {'p95 ms':>8} {'overlap with mmr':>17}")
+    baseline = runs["mmr"][0]
+    for name, (results, latencies) in runs.items():
+        overlap = statistics.mean(
+            len({_document_key(d) for d in got} & {_document_key(d) for d in want}) / max(len(want), 1)
+            for got, want in zip(results, baseline)
+        )
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{name:<10} {p50:>8.1f} {p95:>8.1f} {overlap:>17.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hybrid lexical + vector retrieval")
+    parser.add_argument("command", choices=["setup", "benchmark"])
+    parser.add_argument("queries", nargs="?", help="benchmark: file with one query per line")
+    parser.add_argument("--k", type=int, default=HYBRID_K)
+    args = parser.parse_args()
+    if args.command == "setup":
+        setup(get_engine())
+    else:
+        if not args.queries:
+            parser.error("benchmark needs a file of queries")
+        with open(args.queries, encoding="utf-8") as f:
+            benchmark([line.strip() for line in f if line.strip()], args.k)
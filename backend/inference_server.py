@@ -0,0 +1,225 @@
+# inference_server.py
+"""
+Shared inference for the toxicity and zero-shot classifiers.
+
+INFERENCE_MODE selects how texts reach the models:
+  - "direct":  call the pipeline in the calling thread (previous behaviour).
+  - "batched": queue texts from all requests in this process and run them as
+               micro-batches on a background thread.
+  - "socket":  send texts to a sidecar started with
+               `python inference_server.py --socket <path>`, which batches
+               across every worker process connected to it.
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+import model_registry
+from config import (
+    INFERENCE_MODE, INFERENCE_SOCKET_PATH,
+    INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS,
+)
+
+
+def _first(result):
+    # Pipelines return a dict per input, or a list of dicts when top_k is set.
+    return result[0] if isinstance(result, list) else result
+
+
+def _run_toxicity(texts):
+    classifier = model_registry.get(model_registry.TOXICITY_MODEL)
+    results = classifier(list(texts), batch_size=len(texts), truncation=True)
+    return [_first(result) for result in results]
+
+
+def _run_zero_shot(texts, labels, multi_label):
+    classifier = model_registry.get(model_registry.ZERO_SHOT_MODEL)
+    results = classifier(list(texts), list(labels), multi_label=multi_label,
+                         batch_size=len(texts))
+    if isinstance(results, dict):
+        results = [results]
+    return results
+
+
+class MicroBatcher:
+    """
+    Collects submitted items into batches of up to `max_batch_size`, waiting at
+    most `max_wait_ms` after the first item, and resolves one Future per item.
+
+    `run_batch(items)` must return one result per item, in order.
+    """
+
+    def __init__(self, name, run_batch, max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                 max_wait_ms=INFERENCE_MAX_WAIT_MS):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._loop, name=f"microbatch-{self.name}", daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, item):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        metrics.set_gauge(f"inference.{self.name}.queue_depth", self._queue.qsize())
+        return future
+
+    def map(self, items):
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            metrics.set_gauge(f"inference.{self.name}.queue_depth", self._queue.qsize())
+            metrics.observe(f"inference.{self.name}.batch_size", len(batch))
+            started = time.perf_counter()
+            for _, _, queued_at in batch:
+                metrics.observe(f"inference.{self.name}.queue_wait_ms",
+                                (started - queued_at) * 1000)
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.run_batch(items)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            metrics.observe(f"inference.{self.name}.batch_ms",
+                            (time.perf_counter() - started) * 1000)
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+
+def _run_zero_shot_items(items):
+    # Items sharing the same labels can go through one pipeline call.
+    results = [None] * len(items)
+    groups = {}
+    for index, (text, labels, multi_label) in enumerate(items):
+        groups.setdefault((tuple(labels), multi_label), []).append(index)
+    for (labels, multi_label), indexes in groups.items():
+        group_results = _run_zero_shot([items[i][0] for i in indexes], labels, multi_label)
+        for index, result in zip(indexes, group_results):
+            results[index] = result
+    return results
+
+
+toxicity_batcher = MicroBatcher("toxicity", _run_toxicity)
+zero_shot_batcher = MicroBatcher("zero_shot", _run_zero_shot_items)
+
+
+class SocketInferenceClient:
+    """Client for the sidecar; one newline-delimited JSON request per call."""
+
+    def __init__(self, path=INFERENCE_SOCKET_PATH):
+        self.path = path
+
+    def request(self, payload):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.connect(self.path)
+            stream = conn.makefile("rwb")
+            stream.write(json.dumps(payload).encode("utf-8") + b"\n")
+            stream.flush()
+            response = json.loads(stream.readline())
+        if "error" in response:
+            raise RuntimeError(f"Inference sidecar error: {response['error']}")
+        return response["results"]
+
+
+def classify_toxicity(texts):
+    """Top toxicity label and score for each text."""
+    if not texts:
+        return []
+    if INFERENCE_MODE == "batched":
+        return toxicity_batcher.map(texts)
+    if INFERENCE_MODE == "socket":
+        return SocketInferenceClient().request({"model": "toxicity", "texts": list(texts)})
+    return _run_toxicity(texts)
+
+
+def classify_zero_shot(texts, labels, multi_label=True):
+    """Zero-shot labels and scores for each text against the candidate labels."""
+    if not texts:
+        return []
+    if INFERENCE_MODE == "batched":
+        return zero_shot_batcher.map([(text, tuple(labels), multi_label) for text in texts])
+    if INFERENCE_MODE == "socket":
+        return SocketInferenceClient().request({
+            "model": "zero_shot", "texts": list(texts),
+            "labels": list(labels), "multi_label": multi_label,
+        })
+    return _run_zero_shot(texts, labels, multi_label)
+
+
+class _InferenceRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            payload = json.loads(self.rfile.readline())
+            if payload["model"] == "toxicity":
+                results = toxicity_batcher.map(payload["texts"])
+            elif payload["model"] == "zero_shot":
+                results = zero_shot_batcher.map([
+                    (text, tuple(payload["labels"]), payload.get("multi_label", True))
+                    for text in payload["texts"]
+                ])
+            elif payload["model"] == "metrics":
+                results = metrics.snapshot()
+            else:
+                raise ValueError(f"Unknown model '{payload['model']}'")
+            response = {"results": results}
+        except Exception as e:
+            response = {"error": str(e)}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path=INFERENCE_SOCKET_PATH, warm_up=True):
+    if os.path.exists(path):
+        os.remove(path)
+    if warm_up:
+        model_registry.warm_up([model_registry.TOXICITY_MODEL, model_registry.ZERO_SHOT_MODEL])
+    with _ThreadingUnixServer(path, _InferenceRequestHandler) as server:
+        print(f"🚀 Inference sidecar listening on {path}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-batching inference sidecar")
+    parser.add_argument("--socket", default=INFERENCE_SOCKET_PATH)
+    parser.add_argument("--no-warm-up", action="store_true")
+    args = parser.parse_args()
+    serve(args.socket, warm_up=not args.no_warm_up)
@@ -0,0 +1,287 @@
+# ingest.py
+"""
+Load a directory of SOWs (DOCX, PDF, text) into the PGVector knowledge base.
+
+Files are parsed and split into section-aware, overlapping chunks in a
+process pool. Chunks are deduplicated by content hash, which is also their
+document id. They are embedded in batches under a rate limit and written
+with one bulk insert per batch. A JSON manifest records finished files and
+stored chunks, so a rerun only handles new or changed files; chunks an edit
+removed from a file are deleted from the store. PDFs need
+`pip install pypdf`.
+
+    python ingest.py ./sows --workers 4 --batch-size 64 --calls-per-minute 120
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+SUPPORTED_EXTENSIONS = {".docx", ".pdf", ".txt", ".md"}
+
+# Numbered ("3.2 Deliverables"), markdown ("## Scope") or all-caps short lines.
+_HEADING = re.compile(r"^(?:#{1,6}\s+.+|\d+(?:\.\d+)*\.?\s+[A-Z][^.]{0,80}|[A-Z][A-Z0-9 &/,()-]{2,80})$")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def parse_file(path):
+    """[(section title, text)] for a DOCX, PDF or text file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".docx":
+        import docx
+        sections = [("", [])]
+        for paragraph in docx.Document(path).paragraphs:
+            text = paragraph.text.strip()
+            if not text:
+                continue
+            if paragraph.style is not None and paragraph.style.name.startswith(("Heading", "Title")):
+                sections.append((text, []))
+            else:
+                sections[-1][1].append(text)
+        return [(title, "\n".join(lines)) for title, lines in sections if lines]
+    if extension == ".pdf":
+        from pypdf import PdfReader
+        text = "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    else:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    return split_sections(text)
+
+
+def split_sections(text):
+    """Split plain text into [(section title, text)] at heading-like lines."""
+    sections = [("", [])]
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            sections[-1][1].append("")
+        elif _HEADING.match(stripped):
+            sections.append((stripped.lstrip("#").strip(), []))
+        else:
+            sections[-1][1].append(stripped)
+    return [(title, "\n".join(lines).strip()) for title, lines in sections if "".join(lines).strip()]
+
+
+def _pieces(text, chunk_size):
+    """Paragraphs, then sentences, then hard cuts, each no longer than chunk_size."""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if len(paragraph) <= chunk_size:
+            if paragraph:
+                yield paragraph
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            for start in range(0, len(sentence), chunk_size):
+                yield sentence[start:start + chunk_size]
+
+
+def chunk_section(text, chunk_size, overlap):
+    """Pack pieces of a section into chunks of about chunk_size characters, overlapping by about `overlap`."""
+    chunks = []
+    current = []
+    for piece in _pieces(text, chunk_size):
+        if current and sum(len(p) + 1 for p in current) + len(piece) > chunk_size:
+            chunks.append(" ".join(current))
+            # Carry the tail of the previous chunk over as context.
+            carried = []
+            while current and sum(len(p) + 1 for p in carried) + len(current[-1]) <= overlap:
+                carried.insert(0, current.pop())
+            current = carried
+        current.append(piece)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def chunk_hash(text):
+    return hashlib.sha256(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+def chunk_text_sections(sections, file_name, chunk_size, overlap):
+    """Chunk [(title, text)] into [{"id", "text", "metadata"}]; the section title prefixes each chunk."""
+    chunks = []
+    for title, text in sections:
+        for piece in chunk_section(text, chunk_size, overlap):
+            content = f"{title}\n{piece}" if title else piece
+            chunk_id = chunk_hash(content)
+            chunks.append({
+                "id": chunk_id,
+                "text": content,
+                "metadata": {"id": chunk_id, "fileName": file_name, "section": title, "chunk": len(chunks)},
+            })
+    return chunks
+
+
+def chunk_documents(text, file_name, chunk_size=1500, overlap=200):
+    """LangChain documents for one SOW text, for callers outside the batch pipeline."""
+    from langchain_core.documents import Document
+    return [Document(page_content=chunk["text"], metadata=chunk["metadata"])
+            for chunk in chunk_text_sections(split_sections(text), file_name, chunk_size, overlap)]
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_and_chunk(path, root, chunk_size, overlap):
+    """Runs in a worker process: (relative path, file digest, chunks)."""
+    relative = os.path.relpath(path, root)
+    return relative, _file_digest(path), chunk_text_sections(parse_file(path), relative, chunk_size, overlap)
+
+
+class RateLimiter:
+    """Allow at most `calls_per_minute` calls, spaced evenly."""
+
+    def __init__(self, calls_per_minute):
+        self.interval = 60.0 / calls_per_minute if calls_per_minute else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def embed_with_retry(embeddings, texts, limiter, retries=5):
+    for attempt in range(retries):
+        limiter.wait()
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            backoff = 2 ** attempt
+            print(f"⚠️ Embedding batch failed ({e}); retrying in {backoff}s")
+            time.sleep(backoff)
+
+
+class Manifest:
+    """Finished files (by content digest) and stored chunk ids, saved after every file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+        self.chunk_ids = {chunk_id for entry in self.files.values() for chunk_id in entry["chunks"]}
+
+    def is_done(self, relative, digest):
+        entry = self.files.get(relative)
+        return entry is not None and entry["sha256"] == digest
+
+    def stale_chunks(self, relative, chunk_ids):
+        """Chunks of the file's previous version that neither its new version nor another file has."""
+        entry = self.files.get(relative)
+        if entry is None:
+            return []
+        keep = set(chunk_ids)
+        for other, other_entry in self.files.items():
+            if other != relative:
+                keep.update(other_entry["chunks"])
+        return [chunk_id for chunk_id in entry["chunks"] if chunk_id not in keep]
+
+    def record(self, relative, digest, chunk_ids):
+        self.files[relative] = {"sha256": digest, "chunks": chunk_ids, "ingested_at": time.time()}
+        self.chunk_ids = {chunk_id for entry in self.files.values() for chunk_id in entry["chunks"]}
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f)
+        os.replace(temporary, self.path)
+
+
+def discover(root):
+    for directory, _, names in os.walk(root):
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                yield os.path.join(directory, name)
+
+
+def ingest(root, manifest_path, workers, batch_size, calls_per_minute, chunk_size, overlap):
+    from vector_rag import get_embeddings, get_vector_store
+
+    manifest = Manifest(manifest_path)
+    embeddings = get_embeddings()
+    vector_store = get_vector_store()
+    limiter = RateLimiter(calls_per_minute)
+    stats = {"files": 0, "skipped_files": 0, "failed_files": 0, "chunks": 0, "duplicate_chunks": 0, "stored_chunks": 0,
+             "deleted_chunks": 0}
+    started = time.perf_counter()
+
+    all_paths = list(discover(root))
+    paths = [path for path in all_paths
+             if not manifest.is_done(os.path.relpath(path, root), _file_digest(path))]
+    stats["skipped_files"] = len(all_paths) - len(paths)
+    print(f"📂 {len(paths)} file(s) to ingest, {stats['skipped_files']} unchanged since the last run")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(parse_and_chunk, path, root, chunk_size, overlap) for path in paths]
+        for future in as_completed(futures):
+            try:
+                relative, digest, chunks = future.result()
+            except Exception as e:
+                stats["failed_files"] += 1
+                print(f"❌ Could not parse a file: {e}")
+                continue
+
+            stats["files"] += 1
+            stats["chunks"] += len(chunks)
+            new_chunks = []
+            seen = set()
+            for chunk in chunks:
+                if chunk["id"] in manifest.chunk_ids or chunk["id"] in seen:
+                    stats["duplicate_chunks"] += 1
+                    continue
+                seen.add(chunk["id"])
+                new_chunks.append(chunk)
+
+            for start in range(0, len(new_chunks), batch_size):
+                batch = new_chunks[start:start + batch_size]
+                texts = [chunk["text"] for chunk in batch]
+                vectors = embed_with_retry(embeddings, texts, limiter)
+                # Embedded above under the rate limit, so insert the vectors as they are.
+                vector_store.add_embeddings(texts, vectors, metadatas=[chunk["metadata"] for chunk in batch],
+                                            ids=[chunk["id"] for chunk in batch])
+                stats["stored_chunks"] += len(batch)
+
+            # Chunks dropped by an edit are deleted before the manifest moves on,
+            # so an interrupted run deletes them on the retry.
+            stale = manifest.stale_chunks(relative, [chunk["id"] for chunk in chunks])
+            if stale:
+                vector_store.delete(ids=stale)
+                stats["deleted_chunks"] += len(stale)
+            manifest.record(relative, digest, [chunk["id"] for chunk in chunks])
+            elapsed = time.perf_counter() - started
+            print(f"✅ {relative}: {len(new_chunks)} new of {len(chunks)} chunks, {len(stale)} removed "
+                  f"({stats['stored_chunks'] / elapsed:.1f} chunks/sec overall)")
+
+    stats["seconds"] = round(time.perf_counter() - started, 1)
+    stats["chunks_per_second"] = round(stats["stored_chunks"] / max(stats["seconds"], 1e-9), 1)
+    print(f"📊 {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest SOW documents into the vector store")
+    parser.add_argument("directory", help="Directory of .docx, .pdf, .txt and .md files")
+    parser.add_argument("--manifest", default="ingest_manifest.json", help="Progress file used to resume")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parsing processes")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per embedding request")
+    parser.add_argument("--calls-per-minute", type=int, default=120, help="Embedding requests per minute (0: no limit)")
+    parser.add_argument("--chunk-size", type=int, default=1500, help="Target chunk length in characters")
+    parser.add_argument("--overlap", type=int, default=200, help="Characters repeated between neighbouring chunks")
+    args = parser.parse_args()
+    ingest(args.directory, args.manifest, args.workers, args.batch_size, args.calls_per_minute,
+           args.chunk_size, args.overlap)
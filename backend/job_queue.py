@@ -0,0 +1,79 @@
+# job_queue.py
+"""
+Bounded background queue for long-running SOW generations.
+
+At most `max_workers` jobs run at once and at most `max_pending` jobs may wait
+or run in total; beyond that `submit` raises QueueFullError so the caller can
+reject the request instead of piling work onto the server.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, handler, max_workers, max_pending):
+        """`handler(job_id, payload, cancel_event)` runs one job on a worker thread."""
+        self.handler = handler
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sow-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def depth(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def job_ids(self):
+        """Ids of the jobs waiting or running in this queue."""
+        with self._lock:
+            return list(self._jobs)
+
+    def submit(self, job_id, payload):
+        with self._lock:
+            if len(self._jobs) >= self.max_pending:
+                metrics.increment("jobs.rejected")
+                raise QueueFullError(f"Job queue is full ({self.max_pending} jobs pending)")
+            cancel_event = threading.Event()
+            future = self._executor.submit(self._run, job_id, payload, cancel_event)
+            self._jobs[job_id] = (future, cancel_event)
+            metrics.set_gauge("jobs.pending", len(self._jobs))
+        metrics.increment("jobs.submitted")
+        return job_id
+
+    def _run(self, job_id, payload, cancel_event):
+        try:
+            self.handler(job_id, payload, cancel_event)
+        finally:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+                metrics.set_gauge("jobs.pending", len(self._jobs))
+
+    def cancel(self, job_id):
+        """
+        Cancel a job. Returns "cancelled" if it had not started (it never will),
+        "cancelling" if it is running and will stop at its next checkpoint, or
+        None if the job is not pending in this queue.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        future, cancel_event = job
+        cancel_event.set()
+        metrics.increment("jobs.cancelled")
+        if future.cancel():
+            with self._lock:
+                self._jobs.pop(job_id, None)
+                metrics.set_gauge("jobs.pending", len(self._jobs))
+            return "cancelled"
+        return "cancelling"
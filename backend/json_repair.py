@@ -0,0 +1,124 @@
+# json_repair.py
+"""
+Tolerant parser for JSON produced by the LLM.
+
+Handles the usual ways a response misses strict JSON: markdown code fences,
+text around the object, trailing commas, raw newlines inside strings, and
+output truncated mid-value.
+"""
+import json
+import re
+
+_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*([\s\S]*?)(?:```\s*$|$)")
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _strip_fences(text):
+    match = _FENCE_PATTERN.search(text)
+    return match.group(1) if match else text
+
+
+def _scan(text):
+    """
+    Rewrite `text` into a form json.loads accepts where possible.
+
+    Returns the cleaned characters, the bracket stack and string state left open
+    at the end, and the positions just before each top-level-safe comma, which
+    are used to drop a truncated trailing value.
+    """
+    cleaned = []
+    stack = []
+    in_string = False
+    escaped = False
+    safe_points = []
+
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            elif char == "\n":
+                char = "\\n"
+            elif char == "\r":
+                char = "\\r"
+            elif char == "\t":
+                char = "\\t"
+            cleaned.append(char)
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(char)
+        elif char in "}]":
+            # Drop a trailing comma before the closing bracket.
+            while cleaned and cleaned[-1].isspace():
+                cleaned.pop()
+            if cleaned and cleaned[-1] == ",":
+                cleaned.pop()
+            if stack:
+                stack.pop()
+            if not stack:
+                # The top-level value is complete; ignore any text after it.
+                cleaned.append(char)
+                break
+        elif char == ",":
+            safe_points.append((len(cleaned), list(stack)))
+        cleaned.append(char)
+
+    return cleaned, stack, in_string, safe_points
+
+
+def _close(prefix, stack):
+    text = "".join(prefix).rstrip()
+    text = text.rstrip(",")
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join(_CLOSERS[opener] for opener in reversed(stack))
+
+
+def _loads(text):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+
+def repair_json(text):
+    """Parse `text` as JSON, repairing it if needed. Returns None when hopeless."""
+    if not text:
+        return None
+    text = text.strip()
+    parsed = _loads(text)
+    if parsed is not None:
+        return parsed
+
+    # Only a response that opens with a fence is unwrapped, so backticks
+    # inside string values are left alone.
+    text = _strip_fences(text).strip()
+    parsed = _loads(text)
+    if parsed is not None:
+        return parsed
+
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    if not starts:
+        return None
+    text = text[min(starts):]
+
+    cleaned, stack, in_string, safe_points = _scan(text)
+    if in_string:
+        cleaned.append('"')
+    parsed = _loads(_close(cleaned, stack))
+    if parsed is not None:
+        return parsed
+
+    # The output was most likely cut off inside a value: fall back to the last
+    # complete member and close the brackets that were open at that point.
+    for position, open_stack in reversed(safe_points):
+        parsed = _loads(_close(cleaned[:position], open_stack))
+        if parsed is not None:
+            return parsed
+    return None
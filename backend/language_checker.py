@@ -0,0 +1,65 @@
+# language_checker.py
+"""
+Language quality checks (passive voice and vague terms) for SOW sections.
+
+Sections are parsed together with nlp.pipe on the lean spaCy pipeline from
+the model registry, and results are kept in the section cache so a redraft
+only re-parses the sections that changed.
+"""
+import re
+
+import model_registry
+from config import SPACY_BATCH_SIZE, SPACY_N_PROCESS
+from section_cache import section_cache
+
+VAGUE_TERMS = ["appropriate", "reasonable", "etc."]
+
+_vague_pattern = re.compile(
+    "|".join(rf"\b{re.escape(term)}" + (r"\b" if term[-1].isalnum() else "") for term in VAGUE_TERMS),
+    re.IGNORECASE,
+)
+
+
+def find_vague_terms(text):
+    """(term, start offset) for every vague term in the text."""
+    return [(match.group(0).lower(), match.start()) for match in _vague_pattern.finditer(text)]
+
+
+# Part of every cache key, so changing the pipeline or the term list
+# invalidates earlier results.
+MODEL_VERSION = ":".join([model_registry.SPACY_MODEL, "-".join(model_registry.SPACY_EXCLUDE), "|".join(VAGUE_TERMS)])
+
+
+class LanguageChecker:
+    def _analyze(self, doc, text):
+        passive = [sent.text for sent in doc.sents if any(token.dep_ == "nsubjpass" for token in sent)]
+        return passive, find_vague_terms(text)
+
+    def analyze_sections(self, sections, n_process=SPACY_N_PROCESS, batch_size=SPACY_BATCH_SIZE):
+        """(passive sentences, vague terms with offsets) for each section of a {name: text} mapping."""
+        def analyze_dirty(dirty):
+            nlp = model_registry.get(model_registry.SPACY_MODEL)
+            # Forking workers only pays off for a large batch of sections.
+            processes = n_process if len(dirty) >= batch_size else 1
+            docs = nlp.pipe(dirty.values(), batch_size=batch_size, n_process=processes)
+            return {name: self._analyze(doc, text) for (name, text), doc in zip(dirty.items(), docs)}
+
+        return section_cache.compute("language", MODEL_VERSION, sections, analyze_dirty, keyed_by_name=False)
+
+    def check_text(self, text):
+        """Issues for a whole draft, parsed paragraph by paragraph."""
+        paragraphs = {match.start(): match.group(0) for match in re.finditer(r"\S(?:.|\n(?!\s*\n))*", text)}
+        issues = []
+        positions = {}
+        for offset, (passive, vague) in self.analyze_sections(paragraphs).items():
+            issues += [f"Passive voice: '{sentence}'" for sentence in passive]
+            for term, start in vague:
+                positions.setdefault(term, []).append(offset + start)
+        # One issue per distinct term, however often it is repeated.
+        for term in VAGUE_TERMS:
+            if term in positions:
+                issues.append(f"Vague term used: '{term}' (at characters {', '.join(map(str, sorted(positions[term])))})")
+        return issues
+
+
+language_checker = LanguageChecker()
@@ -0,0 +1,276 @@
+# local_vector_store.py
+"""
+In-process vector store backed by a memory-mapped NumPy matrix.
+
+A store is a directory holding vectors.npy (unit-normalized rows, float32 or
+float16, with spare capacity for appends) and meta.jsonl (one line per write:
+row, id, text and metadata, or a deletion marker). The metadata file is the
+source of truth for which rows exist: vectors are flushed before their line
+is appended, so an interrupted write leaves no partial entry. Other processes pick up appended
+rows on their next search.
+
+It implements the LangChain VectorStore interface used here (add_documents,
+add_embeddings, similarity and MMR search, as_retriever), so vector_rag can
+use it in place of PGVector with VECTOR_STORE_BACKEND=local.
+
+    python local_vector_store.py export --collection sow_embeddings --output ./vector_store
+"""
+import argparse
+import fcntl
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from config import LOCAL_VECTOR_STORE_DIR, LOCAL_VECTOR_DTYPE
+
+VECTORS_FILE = "vectors.npy"
+METADATA_FILE = "meta.jsonl"
+LOCK_FILE = ".lock"
+INITIAL_CAPACITY = 1024
+SCAN_ROWS = 65536
+
+
+class LocalVectorStore(VectorStore):
+    def __init__(self, embeddings, path=LOCAL_VECTOR_STORE_DIR, dtype=LOCAL_VECTOR_DTYPE):
+        self._embeddings = embeddings
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._matrix = None
+        self._capacity_mtime = None
+        self._ids = {}      # id -> row
+        self._rows = []     # row -> (id, text, metadata)
+        self._deleted = set()
+        self._offset = 0    # bytes of meta.jsonl already read
+        self._refresh()
+
+    @property
+    def embeddings(self):
+        return self._embeddings
+
+    # Storage
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def _write_lock(self):
+        # Serializes writers across processes (e.g. several gunicorn workers).
+        with self._lock, open(self._file(LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _open_matrix(self):
+        vectors_path = self._file(VECTORS_FILE)
+        if os.path.exists(vectors_path):
+            mtime = os.stat(vectors_path).st_mtime_ns
+            if self._matrix is None or mtime != self._capacity_mtime:
+                self._matrix = np.load(vectors_path, mmap_mode="r+")
+                self._capacity_mtime = mtime
+
+    def _refresh(self):
+        """Read metadata lines appended since the last call, by this or another process."""
+        with self._lock:
+            metadata_path = self._file(METADATA_FILE)
+            if not os.path.exists(metadata_path) or os.path.getsize(metadata_path) == self._offset:
+                return
+            with open(metadata_path, "rb") as f:
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    self._offset += len(line)
+                    entry = json.loads(line)
+                    row = entry["row"]
+                    if entry.get("deleted"):
+                        self._deleted.add(row)
+                        self._ids.pop(entry["id"], None)
+                        continue
+                    while len(self._rows) <= row:
+                        self._rows.append(None)
+                    self._rows[row] = (entry["id"], entry["text"], entry["metadata"])
+                    self._ids[entry["id"]] = row
+            self._open_matrix()
+
+    def _ensure_capacity(self, rows, dimensions):
+        if self._matrix is not None and self._matrix.shape[0] >= rows:
+            return
+        if self._matrix is not None and self._matrix.shape[1] != dimensions:
+            raise ValueError(f"Store holds {self._matrix.shape[1]}-dimensional vectors, got {dimensions}")
+        capacity = max(INITIAL_CAPACITY, rows, 2 * (self._matrix.shape[0] if self._matrix is not None else 0))
+        temporary = self._file(VECTORS_FILE + ".tmp")
+        grown = np.lib.format.open_memmap(temporary, mode="w+", dtype=self.dtype, shape=(capacity, dimensions))
+        if self._matrix is not None:
+            grown[:len(self._rows)] = self._matrix[:len(self._rows)]
+        grown.flush()
+        del grown
+        os.replace(temporary, self._file(VECTORS_FILE))
+        self._matrix = None
+        self._open_matrix()
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = [str(i) for i in ids] if ids else [str(uuid.uuid4()) for _ in texts]
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        with self._write_lock():
+            rows = []
+            next_row = len(self._rows)
+            for document_id in ids:
+                # Existing ids are overwritten in place, as PGVector upserts them.
+                if document_id in self._ids:
+                    rows.append(self._ids[document_id])
+                else:
+                    rows.append(next_row)
+                    next_row += 1
+            self._ensure_capacity(next_row, vectors.shape[1])
+            self._matrix[rows] = vectors.astype(self.dtype)
+            self._matrix.flush()
+            with open(self._file(METADATA_FILE), "a", encoding="utf-8") as f:
+                for row, document_id, text, metadata in zip(rows, ids, texts, metadatas):
+                    f.write(json.dumps({"row": row, "id": document_id, "text": text, "metadata": metadata}) + "\n")
+            self._refresh()
+        return ids
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(texts, self._embeddings.embed_documents(texts), metadatas, ids)
+
+    def delete(self, ids=None, **kwargs):
+        """Mark rows deleted; their slots in the matrix are not reused."""
+        if not ids:
+            return None
+        with self._write_lock():
+            rows = [(self._ids[str(document_id)], str(document_id)) for document_id in ids
+                    if str(document_id) in self._ids]
+            with open(self._file(METADATA_FILE), "a", encoding="utf-8") as f:
+                for row, document_id in rows:
+                    f.write(json.dumps({"row": row, "id": document_id, "deleted": True}) + "\n")
+            self._refresh()
+        return True
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        return store
+
+    # Search
+
+    def _scores(self, query_vector):
+        self._refresh()
+        count = len(self._rows)
+        if count == 0:
+            return np.zeros(0, dtype=np.float32)
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = np.empty(count, dtype=np.float32)
+        # Scanned in slices so float16 rows are upcast a slice at a time.
+        for start in range(0, count, SCAN_ROWS):
+            block = np.asarray(self._matrix[start:min(count, start + SCAN_ROWS)], dtype=np.float32)
+            scores[start:start + len(block)] = block @ query
+        if self._deleted:
+            scores[list(self._deleted)] = -np.inf
+        return scores
+
+    def _top_rows(self, scores, k):
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [row for row in top[np.argsort(-scores[top])] if scores[row] != -np.inf]
+
+    def _document(self, row):
+        document_id, text, metadata = self._rows[row]
+        return Document(id=document_id, page_content=text, metadata=metadata)
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, **kwargs):
+        scores = self._scores(embedding)
+        # Cosine distance, matching what PGVector returns.
+        return [(self._document(row), float(1 - scores[row])) for row in self._top_rows(scores, k)]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [document for document, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self._embeddings.embed_query(query), k)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector(self._embeddings.embed_query(query), k)
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    def max_marginal_relevance_search_by_vector(self, embedding, k=4, fetch_k=20, lambda_mult=0.5, **kwargs):
+        scores = self._scores(embedding)
+        candidates = self._top_rows(scores, fetch_k)
+        if not candidates:
+            return []
+        vectors = np.asarray(self._matrix[sorted(candidates)], dtype=np.float32)
+        position = {row: i for i, row in enumerate(sorted(candidates))}
+        vectors = vectors[[position[row] for row in candidates]]
+        relevance = scores[candidates]
+
+        selected = [0]
+        while len(selected) < min(k, len(candidates)):
+            redundancy = (vectors @ vectors[selected].T).max(axis=1)
+            mmr = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+            mmr[selected] = -np.inf
+            selected.append(int(np.argmax(mmr)))
+        return [self._document(candidates[i]) for i in selected]
+
+    def max_marginal_relevance_search(self, query, k=4, fetch_k=20, lambda_mult=0.5, **kwargs):
+        return self.max_marginal_relevance_search_by_vector(
+            self._embeddings.embed_query(query), k, fetch_k, lambda_mult
+        )
+
+
+def export_collection(collection, output, dtype=LOCAL_VECTOR_DTYPE, batch_size=1000):
+    """Copy a PGVector collection into a local store, streaming rows from Postgres."""
+    import sqlalchemy as sa
+    from config import POSTGRESQL_BASE_URL
+
+    store = LocalVectorStore(embeddings=None, path=output, dtype=dtype)
+    engine = sa.create_engine(f"postgresql+psycopg://{POSTGRESQL_BASE_URL}")
+    exported = 0
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(sa.text(
+            "SELECT e.id, e.document, e.cmetadata, CAST(e.embedding AS text) AS embedding "
+            "FROM langchain_pg_embedding e JOIN langchain_pg_collection c ON c.uuid = e.collection_id "
+            "WHERE c.name = :collection"
+        ), {"collection": collection})
+        for rows in result.partitions():
+            store.add_embeddings(
+                [row.document for row in rows],
+                [json.loads(row.embedding) for row in rows],
+                metadatas=[row.cmetadata or {} for row in rows],
+                ids=[row.id for row in rows],
+            )
+            exported += len(rows)
+            print(f"✅ Exported {exported} vectors")
+    print(f"🎉 Collection '{collection}' exported to {output} ({exported} vectors, {dtype})")
+
+
+if __name__ == "__main__":
+    from config import EMBEDDING_COL_NAME
+    parser = argparse.ArgumentParser(description="Local memory-mapped vector store")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--collection", default=EMBEDDING_COL_NAME)
+    parser.add_argument("--output", default=LOCAL_VECTOR_STORE_DIR)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default=LOCAL_VECTOR_DTYPE)
+    args = parser.parse_args()
+    export_collection(args.collection, args.output, args.dtype)
@@ -0,0 +1,51 @@
+# metrics.py
+"""
+Minimal in-process metrics: counters, gauges and summaries, safe to update
+from worker threads and exported as a plain dict for the /metrics endpoint.
+"""
+import threading
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_summaries = {}
+
+
+def increment(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name, value):
+    """Record one observation (batch size, latency, ...) in a summary."""
+    with _lock:
+        summary = _summaries.setdefault(
+            name, {"count": 0, "sum": 0.0, "min": value, "max": value}
+        )
+        summary["count"] += 1
+        summary["sum"] += value
+        summary["min"] = min(summary["min"], value)
+        summary["max"] = max(summary["max"], value)
+
+
+def get_counter(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot():
+    with _lock:
+        summaries = {
+            name: {**summary, "avg": summary["sum"] / summary["count"]}
+            for name, summary in _summaries.items()
+        }
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "summaries": summaries,
+        }
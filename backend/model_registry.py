@@ -0,0 +1,192 @@
+# model_registry.py
+"""
+Process-wide registry for the heavy NLP models and the LLM and vector store
+clients used by the agents.
+
+Every model is loaded at most once per process, on first use or through an
+explicit warm-up, and the load time and memory delta are recorded so they
+can be reported.
+"""
+import os
+import threading
+import time
+
+from config import TORCH_NUM_THREADS, INFERENCE_BACKEND
+
+SPACY_MODEL = "spacy_en_core_web_sm"
+ZERO_SHOT_MODEL = "bart_large_mnli"
+TOXICITY_MODEL = "unbiased_toxic_roberta"
+
+_loaders = {}
+_models = {}
+_stats = {}
+_registry_lock = threading.Lock()
+_model_locks = {}
+_warm_up_state = {"status": "idle", "error": None}
+
+
+def _current_rss_bytes():
+    """Resident set size of this process, in bytes."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Not on Linux: fall back to the peak RSS reported by the kernel.
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def memory_usage(pid="self"):
+    """
+    RSS, PSS, unique (private) and shared memory of a process, in MB, from
+    /proc/<pid>/smaps_rollup. Pages shared copy-on-write with a pre-fork master
+    count as shared; PSS splits them between the processes sharing them.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as smaps:
+            for line in smaps:
+                parts = line.split()
+                if len(parts) == 3 and parts[0].endswith(":"):
+                    fields[parts[0][:-1]] = int(parts[1])
+    except (OSError, ValueError):
+        return {}
+    to_mb = lambda kb: round(kb / 1024, 1)
+    return {
+        "rss_mb": to_mb(fields.get("Rss", 0)),
+        "pss_mb": to_mb(fields.get("Pss", 0)),
+        "uss_mb": to_mb(fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)),
+        "shared_mb": to_mb(fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)),
+    }
+
+
+def register(name, loader):
+    """Register a zero-argument loader for a model name."""
+    with _registry_lock:
+        _loaders[name] = loader
+        _model_locks.setdefault(name, threading.Lock())
+
+
+def get(name):
+    """Return the model registered under `name`, loading it on first use."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        if name not in _loaders:
+            raise KeyError(f"No model registered under '{name}'")
+        lock = _model_locks[name]
+
+    # One lock per model so a slow load does not block unrelated models.
+    with lock:
+        model = _models.get(name)
+        if model is not None:
+            return model
+
+        rss_before = _current_rss_bytes()
+        started = time.perf_counter()
+        model = _loaders[name]()
+        load_seconds = time.perf_counter() - started
+        rss_delta = _current_rss_bytes() - rss_before
+
+        _models[name] = model
+        _stats[name] = {
+            "load_seconds": round(load_seconds, 3),
+            "rss_delta_mb": round(rss_delta / (1024 * 1024), 1),
+            "loaded_at": time.time(),
+        }
+        print(f"📦 Loaded model '{name}' in {load_seconds:.2f}s "
+              f"(+{_stats[name]['rss_delta_mb']} MB RSS)")
+        return model
+
+
+def is_loaded(name):
+    return name in _models
+
+
+def warm_up(names=None):
+    """Load the given models (all registered models by default) ahead of traffic."""
+    for name in names or list(_loaders):
+        get(name)
+    return report()
+
+
+def start_background_warm_up(names=None):
+    """Warm up on a daemon thread so the server can answer health checks meanwhile."""
+    def run():
+        _warm_up_state["status"] = "running"
+        try:
+            for name, stats in warm_up(names).items():
+                print(f"{name}: {stats}")
+            _warm_up_state["status"] = "done"
+        except Exception as e:
+            print(f"❌ Model warm-up failed: {e}")
+            _warm_up_state.update(status="failed", error=str(e))
+
+    thread = threading.Thread(target=run, name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def warm_up_status():
+    """"idle", "running", "done" or "failed", with the error of a failed warm-up."""
+    return dict(_warm_up_state)
+
+
+def report():
+    """Load time and memory for each registered model."""
+    return {
+        name: {"loaded": name in _models, **_stats.get(name, {})}
+        for name in _loaders
+    }
+
+
+# check_language only reads sentence boundaries and dependency labels, which
+# come from tok2vec and the parser alone.
+SPACY_EXCLUDE = ["ner", "lemmatizer", "attribute_ruler", "tagger"]
+
+
+def _load_spacy():
+    import spacy
+    return spacy.load("en_core_web_sm", exclude=SPACY_EXCLUDE)
+
+
+def _configure_torch():
+    # Compliance and validation run their models concurrently; capping the
+    # intra-op threads of each keeps them from oversubscribing the cores.
+    if TORCH_NUM_THREADS:
+        import torch
+        torch.set_num_threads(TORCH_NUM_THREADS)
+
+
+# (task, model id, extra pipeline options) for each transformer classifier.
+ZERO_SHOT_PIPELINE = ("zero-shot-classification", "facebook/bart-large-mnli", {"framework": "pt"})
+TOXICITY_PIPELINE = ("text-classification", "unitary/unbiased-toxic-roberta", {})
+
+
+def _load_pipeline(task, model_id, options):
+    if INFERENCE_BACKEND == "onnx":
+        import onnx_backend
+        return onnx_backend.load_pipeline(task, model_id)
+    _configure_torch()
+    from transformers import pipeline
+    return pipeline(task, model=model_id, device=-1, **options)
+
+
+def _load_zero_shot():
+    return _load_pipeline(*ZERO_SHOT_PIPELINE)
+
+
+def _load_toxicity():
+    return _load_pipeline(*TOXICITY_PIPELINE)
+
+
+def model_version(name):
+    """Identifies the outputs of a model, for caches of its results."""
+    return f"{name}:{INFERENCE_BACKEND}"
+
+
+register(SPACY_MODEL, _load_spacy)
+register(ZERO_SHOT_MODEL, _load_zero_shot)
+register(TOXICITY_MODEL, _load_toxicity)
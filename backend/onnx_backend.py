@@ -0,0 +1,139 @@
+# onnx_backend.py
+"""
+ONNX Runtime backend for the transformer classifiers.
+
+Each model is exported to ONNX with optimum, quantized to dynamic int8 and
+cached under ONNX_CACHE_DIR, then wrapped in a regular transformers pipeline
+so callers do not change. Selected with INFERENCE_BACKEND=onnx; needs
+`pip install optimum[onnxruntime]`.
+
+    python onnx_backend.py --export   # build the cached models ahead of time
+    python onnx_backend.py --parity   # compare every label's score with PyTorch
+"""
+import argparse
+import os
+import sys
+import threading
+
+from config import ONNX_CACHE_DIR, ONNX_QUANTIZATION, ONNX_INTRA_OP_THREADS, ONNX_INTER_OP_THREADS
+
+QUANTIZED_FILE_NAME = "model_quantized.onnx"
+
+_export_lock = threading.Lock()
+
+
+def _model_dir(model_id):
+    return os.path.join(ONNX_CACHE_DIR, model_id.replace("/", "--"), ONNX_QUANTIZATION)
+
+
+def export(model_id):
+    """Export and quantize `model_id` unless it is already cached; returns its directory."""
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    target = _model_dir(model_id)
+    model_file = QUANTIZED_FILE_NAME if ONNX_QUANTIZATION != "none" else "model.onnx"
+    with _export_lock:
+        if os.path.exists(os.path.join(target, model_file)):
+            return target
+
+        print(f"📦 Exporting '{model_id}' to ONNX ({ONNX_QUANTIZATION})")
+        export_dir = os.path.join(target, "fp32")
+        ORTModelForSequenceClassification.from_pretrained(model_id, export=True).save_pretrained(export_dir)
+        AutoTokenizer.from_pretrained(model_id).save_pretrained(target)
+
+        if ONNX_QUANTIZATION == "none":
+            ORTModelForSequenceClassification.from_pretrained(export_dir).save_pretrained(target)
+        else:
+            # Dynamic quantization: weights are stored as int8 and activations
+            # are quantized at run time, so no calibration data is needed.
+            quantization_config = getattr(AutoQuantizationConfig, ONNX_QUANTIZATION)(
+                is_static=False, per_channel=False
+            )
+            ORTQuantizer.from_pretrained(export_dir).quantize(
+                save_dir=target, quantization_config=quantization_config
+            )
+        return target
+
+
+def load_pipeline(task, model_id):
+    """A transformers pipeline for `task` running the cached ONNX model on CPU."""
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer, pipeline
+
+    model_dir = export(model_id)
+    session_options = onnxruntime.SessionOptions()
+    if ONNX_INTRA_OP_THREADS:
+        session_options.intra_op_num_threads = ONNX_INTRA_OP_THREADS
+    if ONNX_INTER_OP_THREADS:
+        session_options.inter_op_num_threads = ONNX_INTER_OP_THREADS
+    model = ORTModelForSequenceClassification.from_pretrained(
+        model_dir,
+        file_name=QUANTIZED_FILE_NAME if ONNX_QUANTIZATION != "none" else "model.onnx",
+        provider="CPUExecutionProvider",
+        session_options=session_options,
+    )
+    return pipeline(task, model=model, tokenizer=AutoTokenizer.from_pretrained(model_dir))
+
+
+PARITY_TEXTS = [
+    "The Client shall keep all Confidential Information strictly confidential for three years.",
+    "Either party may terminate this agreement with thirty days written notice.",
+    "The Vendor's total liability is limited to the fees paid under this SOW.",
+    "Deliverables will be reviewed within five business days of submission.",
+    "This proposal is garbage and so are the idiots who wrote it.",
+]
+PARITY_LABELS = ["confidentiality", "termination", "liability"]
+
+
+def score_diff(want, got):
+    """Largest score difference over every label either output has (a missing label scores 0)."""
+    return max(abs(want.get(label, 0.0) - got.get(label, 0.0)) for label in set(want) | set(got))
+
+
+def parity(tolerance):
+    """Run PARITY_TEXTS through both backends; returns the number of mismatches."""
+    import model_registry
+    from transformers import pipeline
+
+    mismatches = 0
+    checks = [
+        # Every label's score, not just the top one: a drift on a secondary
+        # label would otherwise go unnoticed.
+        ("toxicity", model_registry.TOXICITY_PIPELINE,
+         lambda classifier: [[(r["label"], r["score"]) for r in result]
+                             for result in classifier(PARITY_TEXTS, top_k=None)]),
+        ("zero-shot", model_registry.ZERO_SHOT_PIPELINE,
+         lambda classifier: [list(zip(r["labels"], r["scores"]))
+                             for r in classifier(PARITY_TEXTS, PARITY_LABELS, multi_label=True)]),
+    ]
+    for name, (task, model_id, options), run in checks:
+        expected = run(pipeline(task, model=model_id, device=-1, **options))
+        actual = run(load_pipeline(task, model_id))
+        for text, want, got in zip(PARITY_TEXTS, expected, actual):
+            want, got = dict(want), dict(got)
+            same_top = max(want, key=want.get) == max(got, key=got.get)
+            max_diff = score_diff(want, got)
+            ok = same_top and max_diff <= tolerance
+            mismatches += not ok
+            print(f"{'✅' if ok else '❌'} {name}: top label {'matches' if same_top else 'differs'}, "
+                  f"max score diff over {len(want)} labels {max_diff:.4f} — {text[:50]}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and check the ONNX classifiers")
+    parser.add_argument("--export", action="store_true", help="Export and quantize every classifier")
+    parser.add_argument("--parity", action="store_true", help="Compare the ONNX and PyTorch outputs")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Largest accepted score difference")
+    args = parser.parse_args()
+    if args.export:
+        import model_registry
+        for _, model_id, _ in (model_registry.TOXICITY_PIPELINE, model_registry.ZERO_SHOT_PIPELINE):
+            print(f"✅ {model_id} → {export(model_id)}")
+    if args.parity:
+        sys.exit(1 if parity(args.tolerance) else 0)
+    if not (args.export or args.parity):
+        parser.print_help()
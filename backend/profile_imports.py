@@ -0,0 +1,44 @@
+# profile_imports.py
+"""
+Report what makes a module slow to import, using Python's -X importtime.
+
+    python profile_imports.py            # profile `import app`
+    python profile_imports.py graph -n 40
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+
+def profile(module):
+    """(wall seconds, [(cumulative us, self us, package)]) for importing `module` in a fresh interpreter."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f"❌ import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return wall, rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile module import time")
+    parser.add_argument("module", nargs="?", default="app")
+    parser.add_argument("-n", "--top", type=int, default=25, help="Number of imports to list")
+    args = parser.parse_args()
+
+    wall, rows = profile(args.module)
+    print(f"⏱️ import {args.module}: {wall:.2f}s wall, {len(rows)} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
@@ -1,5 +1,27 @@
 from langchain_core.prompts import ChatPromptTemplate
 
+# Keys every drafted SOW must contain, in the order listed in system_template.
+SOW_JSON_KEYS = [
+    "Project Name", "Project Title", "Start Date", "End Date", "SOW Effective Date",
+    "Agreement Date", "Company Information", "Company Name", "Client Name", "Client",
+    "Client Contact", "Contact", "Services Description", "Deliverables", "Milestones",
+    "Acceptance", "Personnel and Locations", "Representatives", "Client Representatives",
+    "Contractor Resources", "Terms & Conditions", "Fees", "Expenses", "Taxes", "Conversion",
+    "Limitation of Liability", "Service Level Agreement", "Assumptions", "Scope of Work",
+    "Change Process", "Payment Terms", "Timeline", "Confidentiality", "Intellectual Property",
+    "Termination",
+]
+
+# JSON schema used for function calling / structured output: every key is a string.
+sow_json_schema = {
+    "title": "StatementOfWork",
+    "description": "A complete Statement of Work with every required section.",
+    "type": "object",
+    "properties": {key: {"type": "string"} for key in SOW_JSON_KEYS},
+    "required": SOW_JSON_KEYS,
+    "additionalProperties": False,
+}
+
 system_template = """\
 #Instruction:
 You are an expert SOW drafting specialist with 15+ years of experience in contract development across various industries including technology, healthcare, finance, manufacturing, and professional services. Your task is to create a comprehensive, legally-sound Statement of Work that meets industry standards and best practices.
@@ -298,3 +320,26 @@ drafting_chat_prompt = ChatPromptTemplate.from_messages(
         ("user", user_chat_prompt)
     ]
 )
+
+user_repair_prompt = """
+ SOW is already generated but some of its sections were rejected. Regenerate ONLY the sections listed below.
+ This is the user_query - {user_query}
+
+ ## Sections to regenerate (current values, empty if missing):
+ {failing_sections}
+
+ ## Errors detected:
+ {feedback}
+
+ ## Instructions:
+  - Return a valid JSON object whose keys are exactly the section names listed above.
+  - Do not include any other section of the SOW.
+  - Keep each value a string, using markdown for points where needed.
+"""
+
+drafting_repair_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", system_template),
+        ("user", user_repair_prompt)
+    ]
+)
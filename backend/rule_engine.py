@@ -0,0 +1,91 @@
+# rule_engine.py
+"""
+Fast deterministic compliance checks built on rules.py.
+
+All REQUIRED_FIELDS patterns, COMPLIANCE_RULES and RISK_TERMS are compiled
+into a single alternation with one named group per pattern, so a draft is
+scanned once. ComplianceAgent.generate_report turns the failed rules into
+content issues, which count towards its compliance score.
+"""
+import re
+
+from rules import REQUIRED_FIELDS, COMPLIANCE_RULES, RISK_TERMS
+
+
+class RuleEngine:
+    def __init__(self, required_fields=REQUIRED_FIELDS, compliance_rules=COMPLIANCE_RULES,
+                 risk_terms=RISK_TERMS):
+        self.required_fields = required_fields
+        self.compliance_rules = compliance_rules
+        self.risk_terms = risk_terms
+
+        # target is ("field", name), ("rule", id) or ("risk", term).
+        patterns = []
+        for name, field_patterns in required_fields.items():
+            patterns += [(("field", name), pattern) for pattern in field_patterns]
+        for rule_id, rule in compliance_rules.items():
+            if rule["type"] == "regex":
+                patterns.append((("rule", rule_id), rule["pattern"]))
+            else:
+                patterns += [(("rule", rule_id), rf"\b{re.escape(keyword)}\b")
+                             for keyword in rule["keywords"]]
+        for term in risk_terms:
+            patterns.append((("risk", term), rf"\b{re.escape(term)}\b"))
+
+        self._group_targets = {}
+        self._target_patterns = {}
+        groups = []
+        for index, (target, pattern) in enumerate(patterns):
+            group = f"g{index}"
+            self._group_targets[group] = target
+            self._target_patterns.setdefault(target, []).append(re.compile(pattern, re.IGNORECASE))
+            groups.append(f"(?P<{group}>{pattern})")
+        self._combined = re.compile("|".join(groups), re.IGNORECASE)
+
+    def _found_targets(self, text):
+        found = {self._group_targets[match.lastgroup] for match in self._combined.finditer(text)}
+        # A match can hide another pattern that starts inside it, so confirm
+        # each miss on its own. Misses are rare and this keeps results exact.
+        for target, patterns in self._target_patterns.items():
+            if target not in found and any(pattern.search(text) for pattern in patterns):
+                found.add(target)
+        return found
+
+    def check(self, text):
+        found = self._found_targets(text)
+
+        missing_fields = [name for name in self.required_fields if ("field", name) not in found]
+        failed_rules = [
+            {"id": rule_id, "description": rule["description"], "severity": rule["severity"]}
+            for rule_id, rule in self.compliance_rules.items()
+            if (("rule", rule_id) in found) != rule["should_exist"]
+        ]
+        risk_terms = [
+            {"term": term, **details} for term, details in self.risk_terms.items()
+            if ("risk", term) in found
+        ]
+
+        risk_impact = sum(term["impact"] for term in risk_terms)
+        if any(rule["severity"] == "High" for rule in failed_rules) or risk_impact >= 3:
+            risk_level = "High"
+        elif failed_rules or risk_impact >= 1:
+            risk_level = "Medium"
+        else:
+            risk_level = "Low"
+
+        return {
+            "missing_fields": missing_fields,
+            "failed_rules": failed_rules,
+            "risk_terms": risk_terms,
+            "risk_level": risk_level,
+        }
+
+
+def sow_to_text(sow_data):
+    """Flatten a parsed SOW (or {"sow_text": ...}) into one string for the rules."""
+    if "sow_text" in sow_data:
+        return sow_data["sow_text"]
+    return "\n".join(f"{key}\n{value}" for key, value in sow_data.items())
+
+
+rule_engine = RuleEngine()
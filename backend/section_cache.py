@@ -0,0 +1,126 @@
+# section_cache.py
+"""
+Cache of per-section check results (toxicity verdicts, clause scores and
+language issues) keyed by section name, content hash and model version.
+
+A redraft or chat edit usually changes one or two sections, so the checks
+only need to run on those. Results live in an in-memory LRU and, when
+SECTION_CACHE_PATH is set, in a SQLite file that survives restarts.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+from lru import LRUCache
+from config import SECTION_CACHE_SIZE, SECTION_CACHE_PATH
+
+_MISSING = object()
+
+
+def content_hash(content):
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class SqliteTier:
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection()
+
+    def _connection(self):
+        # Opened per process: a forked worker must not share the master's connection.
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._pid = os.getpid()
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS section_results "
+                    "(key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection().execute("SELECT value FROM section_results WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else _MISSING
+
+    def set(self, key, kind, value):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO section_results (key, kind, value, created_at) VALUES (?, ?, ?, ?)",
+                    (key, kind, json.dumps(value), time.time()),
+                )
+
+
+class SectionCache:
+    def __init__(self, memory_size=SECTION_CACHE_SIZE, path=SECTION_CACHE_PATH):
+        self.memory = LRUCache(memory_size)
+        self.sqlite = SqliteTier(path) if path else None
+
+    def _key(self, kind, model_version, section, content):
+        return hashlib.sha256(
+            "\0".join([kind, model_version, str(section), content_hash(content)]).encode("utf-8")
+        ).hexdigest()
+
+    def _get(self, key):
+        value = self.memory.get(key, _MISSING)
+        if value is _MISSING and self.sqlite is not None:
+            try:
+                value = self.sqlite.get(key)
+            except sqlite3.Error as e:
+                print(f"❌ Section cache lookup failed: {e}")
+            if value is not _MISSING:
+                self.memory.set(key, value)
+        return value
+
+    def _set(self, key, kind, value):
+        self.memory.set(key, value)
+        if self.sqlite is not None:
+            try:
+                self.sqlite.set(key, kind, value)
+            except sqlite3.Error as e:
+                print(f"❌ Section cache write failed: {e}")
+
+    def compute(self, kind, model_version, sections, compute_dirty, keyed_by_name=True):
+        """
+        Results for every section of a {name: content} mapping. Cached sections
+        are reused; `compute_dirty(dirty_sections)` is called once with the rest
+        and returns {name: result}. Sections it leaves out are returned as None
+        and not cached, for results that could not be computed reliably.
+        With keyed_by_name=False results are shared by content alone, for names
+        that are only positions (paragraphs, windows).
+        """
+        keys = {name: self._key(kind, model_version, name if keyed_by_name else "", content)
+                for name, content in sections.items()}
+        results = {}
+        dirty = {}
+        for name, content in sections.items():
+            value = self._get(keys[name])
+            if value is _MISSING:
+                dirty[name] = content
+            else:
+                results[name] = value
+        metrics.increment(f"section_cache.{kind}.hit", len(results))
+        metrics.increment(f"section_cache.{kind}.miss", len(dirty))
+
+        if dirty:
+            computed = compute_dirty(dirty)
+            for name in dirty:
+                if name in computed:
+                    self._set(keys[name], kind, computed[name])
+                results[name] = computed.get(name)
+        return {name: results[name] for name in sections}
+
+
+section_cache = SectionCache()
@@ -0,0 +1,138 @@
+# semantic_cache.py
+"""
+Semantic cache in front of the LLM calls.
+
+The variable part of a prompt (the user's request) is embedded and looked up
+in a dedicated PGVector collection; a stored completion is reused when its
+similarity is at least SEMANTIC_CACHE_THRESHOLD. Everything that must match
+exactly (flow, prompt version, deployment, and caller-supplied context such
+as the SOW being edited, the form values or the text being extracted) is part
+of the metadata filter, not the embedding. In practice only the chat flow's
+free-text instruction is matched by similarity.
+"""
+import hashlib
+import json
+import re
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import metrics
+from config import (
+    AZURE_DEPLOYMENT_NAME, POSTGRESQL_BASE_URL, EMBEDDING_COL_NAME,
+    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_FLOWS, SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_NEAR_MISS_THRESHOLD, SEMANTIC_CACHE_EMBEDDINGS,
+)
+from generation_cache import PROMPT_VERSION
+
+
+class HashingEmbeddings(Embeddings):
+    """Local stand-in for the Azure embeddings: hashed bag of words, L2-normalized."""
+
+    def __init__(self, dimensions=1024):
+        self.dimensions = dimensions
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            from langchain_postgres import PGVector
+            if SEMANTIC_CACHE_EMBEDDINGS == "local":
+                embeddings = HashingEmbeddings()
+            else:
+                from vector_rag import get_embeddings
+                embeddings = get_embeddings()
+            _store = PGVector(
+                embeddings=embeddings,
+                collection_name=f"{EMBEDDING_COL_NAME}_llm_cache",
+                connection=f"postgresql+psycopg://{POSTGRESQL_BASE_URL}",
+                use_jsonb=True,
+            )
+        return _store
+
+
+def form_context(query_map, feedback=""):
+    """
+    Exact-match context for a form draft: the normalized form values plus any
+    error feedback. Templated requests for different clients or timelines
+    embed almost identically, so only identical forms may share a draft.
+    """
+    values = {key: " ".join(str(value).lower().split()) for key, value in (query_map or {}).items()}
+    return json.dumps(values, sort_keys=True, ensure_ascii=False) + "\0" + feedback
+
+
+def _scope(flow, context):
+    return {
+        "flow": flow,
+        "prompt_version": PROMPT_VERSION,
+        "deployment": AZURE_DEPLOYMENT_NAME or "",
+        "context_hash": hashlib.sha256(context.encode("utf-8")).hexdigest(),
+    }
+
+
+def lookup(flow, query_text, context=""):
+    """Return the cached completion for a similar request, or None."""
+    results = get_store().similarity_search_with_relevance_scores(
+        query_text, k=1, filter=_scope(flow, context)
+    )
+    if not results:
+        metrics.increment(f"semantic_cache.{flow}.miss")
+        return None
+    document, score = results[0]
+    metrics.observe(f"semantic_cache.{flow}.similarity", score)
+    if score >= SEMANTIC_CACHE_THRESHOLD:
+        metrics.increment(f"semantic_cache.{flow}.hit")
+        return document.metadata["completion"]
+    if score >= SEMANTIC_CACHE_NEAR_MISS_THRESHOLD:
+        metrics.increment(f"semantic_cache.{flow}.near_miss")
+    else:
+        metrics.increment(f"semantic_cache.{flow}.miss")
+    return None
+
+
+def store(flow, query_text, completion, context=""):
+    get_store().add_texts([query_text], metadatas=[{**_scope(flow, context), "completion": completion}])
+
+
+def cached_invoke(flow, query_text, invoke, context="", accept=None):
+    """
+    Return a cached completion for `query_text` in `flow`, or call `invoke()`
+    and cache its result. `accept(completion)` can veto caching a result.
+    Cache failures never fail the request.
+    """
+    if not SEMANTIC_CACHE_ENABLED or flow not in SEMANTIC_CACHE_FLOWS:
+        return invoke()
+    try:
+        completion = lookup(flow, query_text, context)
+        if completion is not None:
+            return completion
+    except Exception as e:
+        print(f"❌ Semantic cache lookup failed: {e}")
+
+    completion = invoke()
+    if accept is None or accept(completion):
+        try:
+            store(flow, query_text, completion, context)
+        except Exception as e:
+            print(f"❌ Semantic cache write failed: {e}")
+    return completion
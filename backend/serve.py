@@ -0,0 +1,105 @@
+# serve.py
+"""
+Production entry point: gunicorn with the models preloaded in the master.
+
+The master runs the one-time startup work, loads the spaCy and transformer
+models, moves their weights into shared memory and freezes the garbage
+collector, then forks the workers. Workers share those pages copy-on-write
+instead of loading a copy each. Clients holding sockets (Azure, Postgres,
+the cache tiers' SQLite and SQLAlchemy connections) are created per worker
+process, on first use.
+
+    python serve.py                      # start the server
+    python serve.py --memory-report PID  # RSS/PSS/USS of a running master and its workers
+"""
+import argparse
+import gc
+
+import model_registry
+from config import SERVER_BIND, SERVER_WORKERS, SERVER_THREADS, SERVER_TIMEOUT, PRELOAD_MODELS
+
+
+def preload_models(names=PRELOAD_MODELS):
+    """Load models in this process and prepare them to be shared with forked workers."""
+    for name in names:
+        model = model_registry.get(name)
+        # Transformers pipelines: put the weight tensors in shared memory so
+        # even pages a worker writes to stay shared. Loading only; running
+        # inference here would start thread pools that do not survive fork.
+        torch_model = getattr(model, "model", None)
+        if hasattr(torch_model, "share_memory"):
+            torch_model.eval()
+            torch_model.share_memory()
+    # Objects created so far live for the whole process. Moving them out of
+    # the collector's generations stops collections in the workers from
+    # writing to (and so copying) their pages.
+    gc.collect()
+    gc.freeze()
+
+
+def _worker_pids(master_pid):
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as children:
+            return [int(pid) for pid in children.read().split()]
+    except OSError:
+        return []
+
+
+def memory_report(master_pid):
+    rows = [("master", master_pid)] + [("worker", pid) for pid in _worker_pids(master_pid)]
+    print(f"{'process':>8} {'pid':>8} {'rss MB':>9} {'pss MB':>9} {'uss MB':>9} {'shared MB':>10}")
+    total_pss = 0
+    for role, pid in rows:
+        usage = model_registry.memory_usage(pid)
+        if not usage:
+            continue
+        total_pss += usage["pss_mb"]
+        print(f"{role:>8} {pid:>8} {usage['rss_mb']:>9} {usage['pss_mb']:>9} "
+              f"{usage['uss_mb']:>9} {usage['shared_mb']:>10}")
+    print(f"📊 Total PSS: {round(total_pss, 1)} MB")
+
+
+def post_worker_init(worker):
+    usage = model_registry.memory_usage()
+    print(f"👷 Worker {worker.pid} ready: {usage.get('uss_mb')} MB unique, "
+          f"{usage.get('shared_mb')} MB shared")
+
+
+def serve():
+    from gunicorn.app.base import BaseApplication
+    from app import app, db, initialize
+
+    class SOWServer(BaseApplication):
+        def load_config(self):
+            for key, value in {
+                "bind": SERVER_BIND,
+                "workers": SERVER_WORKERS,
+                # Threads let one worker hold several SSE streams and job polls.
+                "worker_class": "gthread",
+                "threads": SERVER_THREADS,
+                "timeout": SERVER_TIMEOUT,
+                "preload_app": True,
+                "post_worker_init": post_worker_init,
+            }.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    initialize()
+    preload_models()
+    # Connections opened during startup must not be shared by the workers.
+    with app.app_context():
+        db.engine.dispose()
+    SOWServer().run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the SOW backend with pre-forked workers")
+    parser.add_argument("--memory-report", type=int, metavar="MASTER_PID",
+                        help="Print memory use of a running server instead of starting one")
+    args = parser.parse_args()
+    if args.memory_report:
+        memory_report(args.memory_report)
+    else:
+        serve()
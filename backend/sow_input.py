@@ -0,0 +1,48 @@
+# sow_input.py
+"""
+Turns the SOW form submitted by the frontend into the query map and query
+text that the drafting graph expects.
+"""
+
+# Form field sent by the frontend -> (query_map key, default value).
+FORM_FIELDS = {
+    "sowType": ("sow_type", "Unknown"),
+    "workType": ("work_type", "Unknown"),
+    "projectObjectives": ("project_objectives", "NA"),
+    "projectScope": ("project_scope", "NA"),
+    "servicesDescription": ("detailed_desc", "NA"),
+    "specificFeatures": ("specific_feature", "NA"),
+    "platformsTechnologies": ("platform_tech", "NA"),
+    "integrations": ("integrations", "NA"),
+    "designSpecifications": ("design_specification", "NA"),
+    "outOfScope": ("out_of_scope", "NA"),
+    "deliverables": ("deliverables", "NA"),
+    "timeline": ("project_timeline", "NA"),
+}
+
+
+def query_map_from_form(data):
+    """Build the query map from the frontend form fields."""
+    return {key: data.get(field, default) for field, (key, default) in FORM_FIELDS.items()}
+
+
+def complete_query_map(query_map):
+    """Fill the keys a partial query map leaves out with the form defaults."""
+    return {key: query_map.get(key, default) for key, default in FORM_FIELDS.values()}
+
+
+def build_user_query(query_map):
+    return (
+        f"The type of SOW should be {query_map['sow_type']}.\n"
+        f"The type of work is {query_map['work_type']}.\n"
+        f"Objectives of project are {query_map['project_objectives']}.\n"
+        f"Scope of the project is {query_map['project_scope']}.\n"
+        f"Detailed Description of Services is {query_map['detailed_desc']}.\n"
+        f"Specific Features are {query_map['specific_feature']}.\n"
+        f"Platforms and Technologies is {query_map['platform_tech']}.\n"
+        f"Integrations is {query_map['integrations']}.\n"
+        f"Design Specifications are {query_map['design_specification']}.\n"
+        f"Out of Scope is {query_map['out_of_scope']}.\n"
+        f"Deliverables are {query_map['deliverables']}.\n"
+        f"Project Timeline and Schedule is {query_map['project_timeline']}."
+    )
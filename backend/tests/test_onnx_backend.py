@@ -0,0 +1,74 @@
+import os
+import re
+
+import pytest
+
+import onnx_backend
+
+TEXTS = ["Either party may terminate with thirty days notice.", "The vendor's liability is capped."]
+LABELS = ["toxicity", "insult", "threat"]
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """A small randomly initialised classifier saved locally, so no download is needed."""
+    # The export path needs `pip install optimum[onnxruntime]`.
+    pytest.importorskip("optimum.onnxruntime")
+    torch = pytest.importorskip("torch")
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizer
+
+    path = tmp_path_factory.mktemp("tiny-classifier")
+    words = sorted({word for text in TEXTS for word in re.findall(r"\w+|[^\w\s]", text.lower())})
+    with open(path / "vocab.txt", "w", encoding="utf-8") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words))
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=5 + len(words), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, id2label=dict(enumerate(LABELS)), label2id={l: i for i, l in enumerate(LABELS)},
+    )
+    BertForSequenceClassification(config).save_pretrained(path)
+    BertTokenizer(str(path / "vocab.txt")).save_pretrained(path)
+    return str(path)
+
+
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(onnx_backend, "ONNX_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def scores(classifier):
+    return [{r["label"]: r["score"] for r in result} for result in classifier(TEXTS, top_k=None)]
+
+
+def reference_scores(model_id):
+    from transformers import pipeline
+    return scores(pipeline("text-classification", model=model_id, device=-1))
+
+
+def test_export_quantizes_once_and_caches(tiny_model, cache_dir, monkeypatch):
+    monkeypatch.setattr(onnx_backend, "ONNX_QUANTIZATION", "avx2")
+    target = onnx_backend.export(tiny_model)
+    model_file = os.path.join(target, onnx_backend.QUANTIZED_FILE_NAME)
+    assert os.path.exists(model_file)
+
+    modified = os.path.getmtime(model_file)
+    assert onnx_backend.export(tiny_model) == target
+    assert os.path.getmtime(model_file) == modified
+
+    # The quantized model scores every label, close to the PyTorch model.
+    quantized = scores(onnx_backend.load_pipeline("text-classification", tiny_model))
+    for want, got in zip(reference_scores(tiny_model), quantized):
+        assert set(got) == set(LABELS)
+        assert onnx_backend.score_diff(want, got) < 0.05
+
+
+def test_unquantized_export_matches_pytorch_on_every_label(tiny_model, cache_dir, monkeypatch):
+    monkeypatch.setattr(onnx_backend, "ONNX_QUANTIZATION", "none")
+    exported = scores(onnx_backend.load_pipeline("text-classification", tiny_model))
+    for want, got in zip(reference_scores(tiny_model), exported):
+        assert onnx_backend.score_diff(want, got) < 1e-3
+
+
+def test_score_diff_counts_missing_labels():
+    assert onnx_backend.score_diff({"toxic": 0.9, "insult": 0.2}, {"toxic": 0.9}) == pytest.approx(0.2)
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+import semantic_cache
+from sow_input import complete_query_map, build_user_query
+
+
+class InMemoryStore:
+    """PGVector stand-in: cosine search with an exact metadata filter."""
+
+    def __init__(self):
+        self.embeddings = semantic_cache.HashingEmbeddings()
+        self.rows = []
+
+    def add_texts(self, texts, metadatas):
+        for text, metadata in zip(texts, metadatas):
+            self.rows.append((np.array(self.embeddings.embed_query(text)), text, metadata))
+
+    def similarity_search_with_relevance_scores(self, query, k, filter):
+        vector = np.array(self.embeddings.embed_query(query))
+        matches = [(Document(page_content=text, metadata=metadata), float(vector @ row))
+                   for row, text, metadata in self.rows
+                   if all(metadata.get(key) == value for key, value in filter.items())]
+        return sorted(matches, key=lambda match: -match[1])[:k]
+
+
+@pytest.fixture(autouse=True)
+def store(monkeypatch):
+    store = InMemoryStore()
+    monkeypatch.setattr(semantic_cache, "_store", store)
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_FLOWS", ["chat", "form", "extraction"])
+    return store
+
+
+def form(client, timeline):
+    return complete_query_map({
+        "sow_type": "Fixed Price", "work_type": "Web Application",
+        "project_objectives": f"Build a customer portal for {client}",
+        "project_scope": "Design, development and launch of the portal",
+        "project_timeline": timeline,
+    })
+
+
+def draft(query_map, completion):
+    return semantic_cache.cached_invoke(
+        "form", build_user_query(query_map), lambda: completion,
+        context=semantic_cache.form_context(query_map),
+    )
+
+
+def test_forms_differing_in_one_field_miss_the_cache():
+    acme, globex = form("Acme", "6 months"), form("Globex", "12 months")
+    # The templated requests alone are similar enough to hit.
+    embeddings = semantic_cache.HashingEmbeddings()
+    similarity = np.dot(embeddings.embed_query(build_user_query(acme)),
+                        embeddings.embed_query(build_user_query(globex)))
+    assert similarity >= semantic_cache.SEMANTIC_CACHE_THRESHOLD
+
+    assert draft(acme, "acme sow") == "acme sow"
+    assert draft(globex, "globex sow") == "globex sow"
+    assert draft(form("Acme", "12 months"), "acme 12 month sow") == "acme 12 month sow"
+
+
+def test_identical_forms_hit_the_cache():
+    assert draft(form("Acme", "6 months"), "acme sow") == "acme sow"
+    # Whitespace and case in the form values do not matter.
+    assert draft(form("ACME ", "6  months"), "fresh draft") == "acme sow"
+
+
+def test_extraction_is_keyed_on_the_exact_text():
+    def extract(raw_sow, completion):
+        return semantic_cache.cached_invoke("extraction", raw_sow, lambda: completion, context=raw_sow)
+
+    assert extract("Statement of work for Acme. Timeline: 6 months.", "acme") == "acme"
+    assert extract("Statement of work for Globex. Timeline: 6 months.", "globex") == "globex"
+    assert extract("Statement of work for Acme. Timeline: 6 months.", "again") == "acme"
@@ -0,0 +1,231 @@
+# vector_index.py
+"""
+Manage the approximate nearest-neighbour index of the PGVector collection.
+
+langchain_postgres keeps every collection in langchain_pg_embedding, so the
+index is partial: one per collection (WHERE collection_id = ...), built with
+cosine distance to match PGVector's default. pgvector can only index a column
+with a fixed dimension. The column is shared by every collection, so `create`
+only sets one when asked with --dimensions and no stored vector differs.
+
+    python vector_index.py create [--type hnsw|ivfflat] [--collection NAME] [--dimensions 1536]
+    python vector_index.py rebuild | drop | report
+    python vector_index.py benchmark --queries 50 --k 4 --ef-search 20,40,80
+"""
+import argparse
+import json
+import re
+import statistics
+import time
+
+import sqlalchemy as sa
+
+from config import (
+    POSTGRESQL_BASE_URL, EMBEDDING_COL_NAME, VECTOR_INDEX_TYPE,
+    HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, IVFFLAT_LISTS, IVFFLAT_PROBES,
+)
+
+EMBEDDING_TABLE = "langchain_pg_embedding"
+
+
+def get_engine():
+    # AUTOCOMMIT: CREATE/REINDEX ... CONCURRENTLY cannot run in a transaction.
+    return sa.create_engine(f"postgresql+psycopg://{POSTGRESQL_BASE_URL}", isolation_level="AUTOCOMMIT")
+
+
+def collection_id(conn, collection):
+    uuid = conn.execute(sa.text("SELECT uuid FROM langchain_pg_collection WHERE name = :name"),
+                        {"name": collection}).scalar()
+    if uuid is None:
+        raise SystemExit(f"❌ No collection named '{collection}'")
+    return str(uuid)
+
+
+def index_name(collection, index_type):
+    return f"ix_{EMBEDDING_TABLE}_{re.sub(r'[^a-z0-9]+', '_', collection.lower())}_{index_type}"[:63]
+
+
+def column_dimensions(conn):
+    """Declared dimension of the embedding column, or None when it has none."""
+    typmod = conn.execute(sa.text(
+        "SELECT atttypmod FROM pg_attribute "
+        "WHERE attrelid = CAST(:table AS regclass) AND attname = 'embedding'"
+    ), {"table": EMBEDDING_TABLE}).scalar()
+    return typmod if typmod and typmod > 0 else None
+
+
+def stored_dimensions(conn):
+    """{(collection name, dimension): rows} for every vector in the table."""
+    rows = conn.execute(sa.text(
+        f"SELECT c.name, vector_dims(e.embedding) AS dims, count(*) AS n FROM {EMBEDDING_TABLE} e "
+        "JOIN langchain_pg_collection c ON c.uuid = e.collection_id GROUP BY c.name, dims"
+    )).all()
+    return {(row.name, row.dims): row.n for row in rows}
+
+
+def ensure_column_dimensions(conn, dimensions=None):
+    """
+    The column's declared dimension. When it has none, it is only set to
+    `dimensions` on request, and only if every stored vector already has it:
+    all collections share the column, the semantic cache's included.
+    """
+    declared = column_dimensions(conn)
+    if declared:
+        return declared
+    stored = stored_dimensions(conn)
+    summary = ", ".join(f"{name}: {n} x {dims}" for (name, dims), n in sorted(stored.items())) or "none"
+    if dimensions is None:
+        raise SystemExit(f"❌ {EMBEDDING_TABLE}.embedding has no fixed dimension, which pgvector needs to index it. "
+                         f"Stored vectors: {summary}. Rerun with --dimensions N to set it; every collection "
+                         f"in the table must then use N-dimensional embeddings.")
+    other = {key: n for key, n in stored.items() if key[1] != dimensions}
+    if other:
+        raise SystemExit(f"❌ Not setting vector({dimensions}): the table also holds "
+                         f"{', '.join(f'{name}: {n} x {dims}' for (name, dims), n in sorted(other.items()))}. "
+                         f"Re-embed or delete those rows first.")
+    print(f"📐 Setting {EMBEDDING_TABLE}.embedding to vector({int(dimensions)})")
+    conn.execute(sa.text(f"ALTER TABLE {EMBEDDING_TABLE} ALTER COLUMN embedding TYPE vector({int(dimensions)})"))
+    return dimensions
+
+
+def create(conn, collection, index_type, dimensions=None):
+    ensure_column_dimensions(conn, dimensions)
+    cid = collection_id(conn, collection)
+    if index_type == "hnsw":
+        options = f"m = {int(HNSW_M)}, ef_construction = {int(HNSW_EF_CONSTRUCTION)}"
+    else:
+        options = f"lists = {int(IVFFLAT_LISTS)}"
+    name = index_name(collection, index_type)
+    started = time.perf_counter()
+    conn.execute(sa.text(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {EMBEDDING_TABLE} "
+        f"USING {index_type} (embedding vector_cosine_ops) WITH ({options}) "
+        f"WHERE collection_id = '{cid}'"
+    ))
+    print(f"✅ Created {name} ({options}) in {time.perf_counter() - started:.1f}s")
+
+
+def collection_indexes(conn, collection):
+    # Exact names: a prefix match would also catch "<collection>_llm_cache_*".
+    names = [index_name(collection, index_type) for index_type in ("hnsw", "ivfflat")]
+    return conn.execute(sa.text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :table AND indexname = ANY(:names)"
+    ), {"table": EMBEDDING_TABLE, "names": names}).scalars().all()
+
+
+def rebuild(conn, collection):
+    for name in collection_indexes(conn, collection):
+        started = time.perf_counter()
+        conn.execute(sa.text(f"REINDEX INDEX CONCURRENTLY {name}"))
+        print(f"✅ Rebuilt {name} in {time.perf_counter() - started:.1f}s")
+
+
+def drop(conn, collection):
+    for name in collection_indexes(conn, collection):
+        conn.execute(sa.text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        print(f"🧹 Dropped {name}")
+
+
+def report(conn, collection):
+    cid = collection_id(conn, collection)
+    rows = conn.execute(sa.text(f"SELECT count(*) FROM {EMBEDDING_TABLE} WHERE collection_id = :cid"),
+                        {"cid": cid}).scalar()
+    print(f"📊 Collection '{collection}': {rows} vectors, column dimension {column_dimensions(conn) or 'not set'}")
+    print(f"   Search settings: hnsw.ef_search={HNSW_EF_SEARCH}, ivfflat.probes={IVFFLAT_PROBES}")
+    for name in collection_indexes(conn, collection):
+        size, definition, valid = conn.execute(sa.text(
+            "SELECT pg_size_pretty(pg_relation_size(CAST(:name AS regclass))), pg_get_indexdef(CAST(:name AS regclass)), "
+            "indisvalid FROM pg_index WHERE indexrelid = CAST(:name AS regclass)"
+        ), {"name": name}).one()
+        print(f"   {name}: {size}{'' if valid else ' (INVALID, rebuild it)'}\n     {definition}")
+
+
+def _search_store(collection, settings):
+    """A PGVector store on the app's engine, with `settings` applied to each connection."""
+    from langchain_postgres import PGVector
+    from vector_rag import create_engine
+    engine = create_engine()
+
+    @sa.event.listens_for(engine, "connect")
+    def apply_settings(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for setting in settings:
+            cursor.execute(f"SET {setting}")
+        cursor.close()
+        dbapi_connection.commit()
+
+    return PGVector(embeddings=None, collection_name=collection, connection=engine, use_jsonb=True)
+
+
+def _search_all(collection, vectors, k, settings):
+    # The same query PGVector runs for retrieval, with its bound parameters,
+    # so the plan measured is the plan the app gets.
+    store = _search_store(collection, settings)
+    results = []
+    for vector in vectors:
+        started = time.perf_counter()
+        documents = store.similarity_search_with_score_by_vector(vector, k=k)
+        results.append(([document.id for document, _ in documents], (time.perf_counter() - started) * 1000))
+    return results
+
+
+def benchmark(collection, queries, k, ef_search_values, probes_values):
+    """Recall@k and latency of the index against an exact scan, using stored vectors as queries."""
+    engine = sa.create_engine(f"postgresql+psycopg://{POSTGRESQL_BASE_URL}")
+    with engine.connect() as conn:
+        cid = collection_id(conn, collection)
+        vectors = conn.execute(sa.text(
+            f"SELECT CAST(embedding AS text) FROM {EMBEDDING_TABLE} WHERE collection_id = :cid "
+            "ORDER BY random() LIMIT :n"
+        ), {"cid": cid, "n": queries}).scalars().all()
+    vectors = [json.loads(vector) for vector in vectors]
+
+    exact = _search_all(collection, vectors, k, ["enable_indexscan = off"])
+    runs = [("exact scan", exact, exact)]
+    for ef_search in ef_search_values:
+        runs.append((f"hnsw ef_search={ef_search}", exact,
+                     _search_all(collection, vectors, k, [f"hnsw.ef_search = {int(ef_search)}"])))
+    for probes in probes_values:
+        runs.append((f"ivfflat probes={probes}", exact,
+                     _search_all(collection, vectors, k, [f"ivfflat.probes = {int(probes)}"])))
+
+    print(f"📊 {len(vectors)} queries, k={k}")
+    print(f"{'configuration':<24} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for label, truth, results in runs:
+        recall = statistics.mean(
+            len(set(ids) & set(true_ids)) / max(len(true_ids), 1)
+            for (ids, _), (true_ids, _) in zip(results, truth)
+        ) if results else 0.0
+        latencies = sorted(ms for _, ms in results)
+        p50 = latencies[len(latencies) // 2] if latencies else 0.0
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+        print(f"{label:<24} {recall:>7.3f} {p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the PGVector ANN index")
+    parser.add_argument("command", choices=["create", "rebuild", "drop", "report", "benchmark"])
+    parser.add_argument("--collection", default=EMBEDDING_COL_NAME)
+    parser.add_argument("--type", choices=["hnsw", "ivfflat"], default=VECTOR_INDEX_TYPE)
+    parser.add_argument("--dimensions", type=int, default=None,
+                        help="create: fix the embedding column to this dimension if it has none")
+    parser.add_argument("--queries", type=int, default=50, help="benchmark: number of query vectors")
+    parser.add_argument("--k", type=int, default=4, help="benchmark: neighbours per query")
+    parser.add_argument("--ef-search", default=str(HNSW_EF_SEARCH), help="benchmark: comma-separated ef_search values")
+    parser.add_argument("--probes", default="", help="benchmark: comma-separated ivfflat probes values")
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark(args.collection, args.queries, args.k,
+                  [int(v) for v in args.ef_search.split(",") if v],
+                  [int(v) for v in args.probes.split(",") if v])
+    else:
+        with get_engine().connect() as conn:
+            if args.command == "create":
+                create(conn, args.collection, args.type, args.dimensions)
+            elif args.command == "rebuild":
+                rebuild(conn, args.collection)
+            elif args.command == "drop":
+                drop(conn, args.collection)
+            else:
+                report(conn, args.collection)
@@ -1,21 +1,78 @@
 from config import OPENAI_API_KEY, AZURE_DEPLOYMENT_NAME, AZURE_MODEL_NAME, AZURE_API_BASE_URL, AZURE_TEXT_EMBEDDING, AZURE_EMBEDDING_URL_PATH, POSTGRESQL_BASE_URL, EMBEDDING_COL_NAME
-from langchain_postgres import PGVector
-from langchain_openai import AzureOpenAIEmbeddings
-
-# embedding from where to use 
-embeddings = AzureOpenAIEmbeddings(
-    model=AZURE_TEXT_EMBEDDING,
-    azure_endpoint=f"{AZURE_API_BASE_URL}{AZURE_EMBEDDING_URL_PATH}",
-    api_key=OPENAI_API_KEY,
-    openai_api_version="2023-05-15",
-)
-
-vector_store = PGVector(
-    embeddings=embeddings,
-    collection_name=EMBEDDING_COL_NAME,
-    connection= f"postgresql+psycopg://{POSTGRESQL_BASE_URL}",
-    use_jsonb=True,
-)
-
-# Quering embeddings 
-retriever = vector_store.as_retriever(search_type="mmr", search_kwargs={"k": 2})
\ No newline at end of file
+from config import HNSW_EF_SEARCH, IVFFLAT_PROBES, EMBEDDING_CACHE_ENABLED, RETRIEVER_MODE
+from config import VECTOR_STORE_BACKEND, LOCAL_VECTOR_STORE_DIR, LOCAL_VECTOR_DTYPE
+import model_registry
+
+EMBEDDINGS_MODEL = "azure_embeddings"
+VECTOR_STORE = "pgvector_store"
+
+
+def _create_embeddings():
+    from langchain_openai import AzureOpenAIEmbeddings
+    # embedding from where to use 
+    embeddings = AzureOpenAIEmbeddings(
+        model=AZURE_TEXT_EMBEDDING,
+        azure_endpoint=f"{AZURE_API_BASE_URL}{AZURE_EMBEDDING_URL_PATH}",
+        api_key=OPENAI_API_KEY,
+        openai_api_version="2023-05-15",
+    )
+    if EMBEDDING_CACHE_ENABLED:
+        from embedding_cache import CachedEmbeddings
+        embeddings = CachedEmbeddings(embeddings, model=AZURE_TEXT_EMBEDDING or "azure")
+    return embeddings
+
+
+def _create_vector_store():
+    if VECTOR_STORE_BACKEND == "local":
+        from local_vector_store import LocalVectorStore
+        return LocalVectorStore(get_embeddings(), path=LOCAL_VECTOR_STORE_DIR, dtype=LOCAL_VECTOR_DTYPE)
+    # Connects to Postgres and creates the collection if needed, so it is
+    # deferred until the first retrieval or write.
+    from langchain_postgres import PGVector
+    return PGVector(
+        embeddings=get_embeddings(),
+        collection_name=EMBEDDING_COL_NAME,
+        connection=create_engine(),
+        use_jsonb=True,
+    )
+
+
+def create_engine():
+    """Engine whose connections use the configured ANN search settings."""
+    import sqlalchemy as sa
+    engine = sa.create_engine(f"postgresql+psycopg://{POSTGRESQL_BASE_URL}", pool_pre_ping=True)
+
+    @sa.event.listens_for(engine, "connect")
+    def set_search_parameters(dbapi_connection, connection_record):
+        # Each index type ignores the other's setting; both are session-level
+        # so they apply to every similarity query on this connection.
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET hnsw.ef_search = {int(HNSW_EF_SEARCH)}")
+        cursor.execute(f"SET ivfflat.probes = {int(IVFFLAT_PROBES)}")
+        # The collection id is a bound parameter; a generic plan for a
+        # prepared query cannot use the per-collection partial index.
+        cursor.execute("SET plan_cache_mode = force_custom_plan")
+        cursor.close()
+        dbapi_connection.commit()
+
+    return engine
+
+
+def get_embeddings():
+    return model_registry.get(EMBEDDINGS_MODEL)
+
+
+def get_vector_store():
+    return model_registry.get(VECTOR_STORE)
+
+
+def get_retriever():
+    if RETRIEVER_MODE == "hybrid":
+        from hybrid_retriever import HybridRetriever
+        return HybridRetriever()
+    # Quering embeddings 
+    return get_vector_store().as_retriever(search_type="mmr", search_kwargs={"k": 2})
+
+
+model_registry.register(EMBEDDINGS_MODEL, _create_embeddings)
+model_registry.register(VECTOR_STORE, _create_vector_store)
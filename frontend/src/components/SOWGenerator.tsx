@@ -17,6 +17,7 @@ import {
   SelectValue,
 } from "@/components/ui/select";
 import { Export2Word } from "./exportToWord";
+import { postEventStream, ServerSentEvent } from "@/lib/sse";
 
 const API_BASE_URL = 'http://127.0.0.1:8080'
 
@@ -101,6 +102,8 @@ const SOWGenerator = () => {
   const [isLikeLoading, setIsLikeLoading] = useState(false);
   const [isChaGenerating, setIsChaGenerating] = useState(false);
   const [generatedContent, setGeneratedContent] = useState("");
+  const [progress, setProgress] = useState("");
+  const [artifactPath, setArtifactPath] = useState("");
   const { toast } = useToast();
   const [chatMessages, setChatMessages] = useState<{role: 'user' | 'assistant', content: string}[]>([]);
   const [chatInput, setChatInput] = useState("");
@@ -130,7 +133,8 @@ const SOWGenerator = () => {
 
   const handleDownloadDocx = async () => {
     try {
-      const response = await axios.get(`${API_BASE_URL}/static/Generated_SOW_final.docx`, {
+      // Each generation has its own artifact, so concurrent users never download each other's SOW
+      const response = await axios.get(`${API_BASE_URL}/artifacts/${artifactPath}`, {
         responseType: 'blob', // very important to receive binary data
       });
   
@@ -161,6 +165,31 @@ const SOWGenerator = () => {
   };
   
 
+  const nodeLabels: Record<string, string> = {
+    get_relevant_context: "Retrieving similar SOWs",
+    drafting_agent: "Drafting SOW",
+    compliance_agent: "Checking compliance",
+    validation_agent: "Validating content",
+    formatting_agent: "Formatting document",
+  };
+
+  // Updates the progress text as events arrive; throws on a streamed error so callers can toast it.
+  const handleStreamEvent = ({ event, data }: ServerSentEvent) => {
+    if (event === "node_start") {
+      setProgress(`${nodeLabels[data.node] || data.node}...`);
+    } else if (event === "token") {
+      setProgress((prev) => (prev.startsWith("Drafting") ? prev : "Drafting SOW..."));
+    } else if (event === "compliance") {
+      setProgress(`Compliance score ${data.compliance_score}/100 (${data.risk_level} risk)`);
+    } else if (event === "final") {
+      setGeneratedContent(data.message);
+      setArtifactPath(data.fileName);
+      setProgress("");
+    } else if (event === "error") {
+      throw new Error(data.message);
+    }
+  };
+
   const handleGenerate = async () => {
     if (!formData.projectObjectives.trim()) {
       toast({
@@ -171,27 +200,19 @@ const SOWGenerator = () => {
       return;
     }
     setIsGenerating(true);
+    setProgress("");
 
     try {
-      // Gather form data from state variables (Ensure these exists)
-        // Send a POST request to Flask backend
-        const response = await axios.post(`${API_BASE_URL}/generate-sow`, formData, {
-          headers: {
-            'Content-Type': 'application/json',
-          },    
-        });
-
-      if (response.status === 200) {
-        setGeneratedContent(response.data.message)
-        toast({
-          title: "Success",
-          description: "SOW has been generated",
-        });
-        // Handle success (e.g., show a message or trigger file download)
-      }
+      // Stream progress from the Flask backend while the SOW is generated
+      await postEventStream(`${API_BASE_URL}/generate-sow/stream`, formData, handleStreamEvent);
+      toast({
+        title: "Success",
+        description: "SOW has been generated",
+      });
       setIsGenerating(false);
     } catch (error) {
       setIsGenerating(false);
+      setProgress("");
       toast({
         title: "Error",
         description: error?.message || 'Some error occurred while generating SOW',
@@ -237,12 +258,11 @@ const SOWGenerator = () => {
     setChatMessages((prev) => [...prev, userMsg]);
     setChatInput("");
     // Send message to backend
-    axios.post(`${API_BASE_URL}/chat`, {
+    postEventStream(`${API_BASE_URL}/chat/stream`, {
       message: chatInput,
       context: generatedContent,
-    })
-    .then((response) => {
-      setGeneratedContent(response.data.message);
+    }, handleStreamEvent)
+    .then(() => {
       setIsChaGenerating(false);
       setIsGenerating(false);
     }
@@ -457,7 +477,7 @@ const SOWGenerator = () => {
                   <Button variant="outline" disabled>
                       <ThumbsDown className="w-4 h-4" />
                   </Button>
-                  <Button variant="outline" onClick={handleExport}>
+                  <Button variant="outline" onClick={handleExport} disabled={!artifactPath}>
                     <Download className="w-4 h-4 mr-2" />
                     Export to Word
                   </Button>
@@ -496,8 +516,9 @@ const SOWGenerator = () => {
               <Card className="p-6 h-[calc(100%-15rem)] overflow-auto flex-1">
                 <div className="prose max-w-none">
                 {isChaGenerating ? (
-                  <div className="flex items-center justify-center">
+                  <div className="flex items-center justify-center gap-2 text-muted-foreground">
                     <Loader2 className="w-6 h-6 animate-spin" />
+                    {progress}
                   </div>
                 ) : (
                   <MarkdownPreview source={generatedContent} />
@@ -508,7 +529,10 @@ const SOWGenerator = () => {
           ) : (
             <div className="h-full flex items-center justify-center text-muted-foreground">
               {isGenerating ? (
-                <Loader2 className="w-6 h-6 animate-spin" />
+                <div className="flex items-center gap-2">
+                  <Loader2 className="w-6 h-6 animate-spin" />
+                  {progress}
+                </div>
               ) : (
                 'Generated content will appear here'       
               )}
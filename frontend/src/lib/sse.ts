@@ -0,0 +1,56 @@
+export interface ServerSentEvent {
+  event: string;
+  data: any;
+}
+
+// POSTs a JSON body and calls onEvent for every server-sent event in the response.
+// EventSource only supports GET, so the stream is read and parsed by hand.
+// Rejects if the stream closes before one of terminalEvents arrives (e.g. a dropped connection).
+export async function postEventStream(
+  url: string,
+  body: unknown,
+  onEvent: (event: ServerSentEvent) => void,
+  terminalEvents: string[] = ["final", "error"],
+) {
+  const response = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let finished = false;
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+
+      let event = "message";
+      const dataLines: string[] = [];
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) dataLines.push(line.slice(5).trim());
+      }
+      if (dataLines.length) {
+        if (terminalEvents.includes(event)) finished = true;
+        onEvent({ event, data: JSON.parse(dataLines.join("\n")) });
+      }
+    }
+  }
+
+  if (!finished) {
+    throw new Error("The connection closed before the SOW was finished");
+  }
+}